@@ -1,16 +1,31 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Any, Union
-from enum import Enum
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Any, Union
+from enum import Enum, IntEnum
 import logging
 from dataclasses import dataclass, field
 from collections import defaultdict
+from bisect import bisect_left, bisect_right
 import json
-import traceback
 import csv
 from io import StringIO, BytesIO
 import sys
+from functools import lru_cache
+from types import MappingProxyType
+
+from api.kernels import (
+    NUMBA_AVAILABLE, RULE_A, RULE_B, RULE_C, RULE_D, RULE_OUTSIDE_PERIOD, RULE_POST_LOOKBACK,
+    fifo_match_kernel, held_loss_batch, kh_loss_batch, kh_loss_kernel, to_epoch_us,
+    twitter_loss_batch, twitter_loss_kernel,
+)
+
+# Optional Arrow-backed string columns for the matches DataFrame
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(
@@ -19,6 +34,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Common trade date formats, tried in order before falling back to inference
+DATE_FORMATS = [
+    '%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y',
+    '%d/%m/%Y', '%Y%m%d', '%m-%d-%Y',
+    '%Y-%m-%d %H:%M:%S', '%m/%d/%Y %H:%M:%S',
+    '%Y-%m-%d %H:%M', '%m/%d/%Y %H:%M'
+]
+
+
+def _to_wall_time(timestamp: pd.Timestamp) -> pd.Timestamp:
+    """
+    Drop a parsed UTC offset, keeping the wall time as written
+
+    The plan's dates and cut-offs (e.g. 3:07 PM on 4/28/2015) are naive
+    market-local times, so '2015-04-28T15:00:00-04:00' must stay 15:00
+    rather than be converted to 19:00 UTC.
+    """
+    if timestamp is not pd.NaT and timestamp.tzinfo is not None:
+        return timestamp.tz_localize(None)
+    return timestamp
+
+
+# Row classification codes used while loading transactions
+KIND_INFER = -1
+KIND_PURCHASE = 0
+KIND_SALE = 1
+KIND_BEGINNING = 2
+
+# Transaction type keywords per row kind, matched in this order
+# (beginning > purchase > sale)
+TYPE_KEYWORDS = [
+    (KIND_BEGINNING, ('beginning', 'holding', 'opening')),
+    (KIND_PURCHASE, ('purchase', 'buy')),
+    (KIND_SALE, ('sale', 'sell')),
+]
+
 
 class TransactionType(Enum):
     """Transaction type enumeration"""
@@ -28,13 +79,51 @@ class TransactionType(Enum):
     OPENING_POSITION = "OPENING_POSITION"
 
 
+class RuleCode(IntEnum):
+    """Plan of allocation rule applied to a match (member names are the report codes)"""
+    OUTSIDE_PERIOD = RULE_OUTSIDE_PERIOD
+    A = RULE_A
+    B = RULE_B
+    C = RULE_C
+    D = RULE_D
+    POST_LOOKBACK = RULE_POST_LOOKBACK
+
+
+# rule_applied text per rule, shared by every match instead of rebuilt per call
+_RULE_MSG_OUTSIDE_PERIOD = 'Purchase outside class period'
+
+_RULE_MSG_TWITTER = {
+    RuleCode.A: 'Rule (a): Sold before first corrective disclosure',
+    RuleCode.B: 'Rule (b): Sold during class period after corrective disclosure',
+    RuleCode.C: 'Rule (c): Sold during lookback period',
+    RuleCode.D: 'Rule (d): Held shares',
+    RuleCode.POST_LOOKBACK: 'Sold after lookback period',
+}
+
+_RULE_MSG_KRAFT_HEINZ = {
+    RuleCode.A: 'Rule A: Sold before first corrective disclosure',
+    RuleCode.B: 'Rule B: Sold during class period after corrective disclosure',
+    RuleCode.C: 'Rule C: Sold during lookback period',
+    RuleCode.D: 'Rule D: Held shares',
+    RuleCode.POST_LOOKBACK: 'Sold after lookback period',
+}
+
+
+# Column order of the matches DataFrame and CSV export
+MATCH_COLUMNS = (
+    'match_id', 'purchase_id', 'sale_id', 'quantity', 'recognized_loss',
+    'loss_per_share', 'rule_applied', 'rule_code', 'purchase_date', 'sale_date',
+    'purchase_price', 'sale_price', 'entity', 'fund_name', 'details'
+)
+
+
 class SettlementType(Enum):
     """Settlement type enumeration"""
     TWITTER = "TWITTER"
     KRAFT_HEINZ = "KRAFT_HEINZ"
 
 
-@dataclass
+@dataclass(slots=True)
 class Transaction:
     """Transaction data class"""
     id: str
@@ -47,22 +136,25 @@ class Transaction:
     security_id: Optional[str] = None
     comment: Optional[str] = None
     remaining_quantity: Optional[float] = None
+    entity_code: int = -1      # index into SettlementCalculator.entity_categories
+    fund_code: int = -1        # index into SettlementCalculator.fund_categories
     
     def __post_init__(self):
         if self.remaining_quantity is None:
             self.remaining_quantity = self.quantity
 
 
-@dataclass
+@dataclass(slots=True)
 class InflationPeriod:
     """Inflation period data class"""
     start: datetime
     end: datetime
     inflation: float
     name: Optional[str] = None
+    sale_only: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class TimeGroup:
     """Time group for Twitter settlement"""
     name: str
@@ -71,10 +163,14 @@ class TimeGroup:
     index: int
 
 
-@dataclass
+@dataclass(slots=True)
 class MatchResult:
-    """Result of purchase-sale matching"""
-    match_id: str
+    """
+    Result of purchase-sale matching
+    
+    match_id is built on first access from the purchase/sale ids and
+    match_seq, the match's position among the kept sale (or held) matches.
+    """
     purchase_id: str
     sale_id: Optional[str]
     quantity: float
@@ -88,10 +184,158 @@ class MatchResult:
     entity: str
     fund_name: str
     details: Dict[str, Any] = field(default_factory=dict)
+    entity_code: int = -1      # index into SettlementCalculator.entity_categories
+    fund_code: int = -1        # index into SettlementCalculator.fund_categories
+    match_seq: int = -1
+    _match_id: Optional[str] = field(default=None, repr=False, compare=False)
     
-    def __post_init__(self):
-        if not self.match_id:
-            self.match_id = f"{self.purchase_id}_{self.sale_id or 'held'}"
+    @property
+    def match_id(self) -> str:
+        if self._match_id is None:
+            self._match_id = f"{self.purchase_id}_{self.sale_id or 'held'}"
+            if self.match_seq >= 0:
+                self._match_id += f"_{self.match_seq}"
+        return self._match_id
+
+
+# Transaction type -> compact integer code used by array-based matching
+TRANSACTION_TYPE_CODES = {
+    TransactionType.PURCHASE: KIND_PURCHASE,
+    TransactionType.SALE: KIND_SALE,
+    TransactionType.BEGINNING_HOLDINGS: KIND_BEGINNING,
+    TransactionType.OPENING_POSITION: KIND_BEGINNING,
+}
+
+
+@dataclass(slots=True)
+class TransactionArray:
+    """Structure-of-arrays view over a list of transactions for matching"""
+    transactions: List[Transaction]
+    dates: np.ndarray        # datetime64[us]
+    prices: np.ndarray       # float64
+    quantities: np.ndarray   # float64
+    remaining: np.ndarray    # float64, consumed in place during matching
+    type_codes: np.ndarray   # int8 KIND_* codes
+    
+    @classmethod
+    def from_transactions(cls, transactions: List[Transaction]) -> 'TransactionArray':
+        """Build the parallel arrays in one pass over the transactions"""
+        quantities = np.array([t.quantity for t in transactions], dtype=np.float64)
+        return cls(
+            transactions=transactions,
+            dates=np.array([t.date for t in transactions], dtype='datetime64[us]'),
+            prices=np.array([t.price for t in transactions], dtype=np.float64),
+            quantities=quantities,
+            remaining=quantities.copy(),
+            type_codes=np.array([TRANSACTION_TYPE_CODES[t.type] for t in transactions],
+                                dtype=np.int8),
+        )
+    
+    def __len__(self) -> int:
+        return len(self.transactions)
+    
+    def take(self, order: np.ndarray) -> 'TransactionArray':
+        """Reordered copy (transactions and every column) following order"""
+        return TransactionArray(
+            transactions=[self.transactions[i] for i in order.tolist()],
+            dates=self.dates[order],
+            prices=self.prices[order],
+            quantities=self.quantities[order],
+            remaining=self.remaining[order],
+            type_codes=self.type_codes[order],
+        )
+    
+    def sync_remaining(self):
+        """Write the remaining quantities back onto the transaction objects"""
+        for txn, remaining in zip(self.transactions, self.remaining.tolist()):
+            txn.remaining_quantity = remaining
+
+
+@lru_cache(maxsize=1)
+def _load_twitter_avg_prices() -> Mapping[datetime, float]:
+    """Load Twitter average closing prices from Table 2"""
+    # Full table from Twitter settlement notice Table 2
+    return MappingProxyType({
+        # August 2015
+        datetime(2015, 8, 3): 29.27, datetime(2015, 8, 4): 29.31,
+        datetime(2015, 8, 5): 29.03, datetime(2015, 8, 6): 28.66,
+        datetime(2015, 8, 7): 28.33, datetime(2015, 8, 10): 28.35,
+        datetime(2015, 8, 11): 28.33, datetime(2015, 8, 12): 28.59,
+        datetime(2015, 8, 13): 28.45, datetime(2015, 8, 14): 28.40,
+        datetime(2015, 8, 17): 28.23, datetime(2015, 8, 18): 28.48,
+        datetime(2015, 8, 19): 27.94, datetime(2015, 8, 20): 27.72,
+        datetime(2015, 8, 21): 27.37, datetime(2015, 8, 24): 26.47,
+        datetime(2015, 8, 25): 26.60, datetime(2015, 8, 26): 26.94,
+        datetime(2015, 8, 27): 27.73, datetime(2015, 8, 28): 27.74,
+        datetime(2015, 8, 31): 27.87,
+        # September 2015
+        datetime(2015, 9, 1): 26.87, datetime(2015, 9, 2): 27.27,
+        datetime(2015, 9, 3): 27.69, datetime(2015, 9, 4): 27.02,
+        datetime(2015, 9, 8): 27.63, datetime(2015, 9, 9): 27.92,
+        datetime(2015, 9, 10): 27.83, datetime(2015, 9, 11): 27.79,
+        datetime(2015, 9, 14): 27.63, datetime(2015, 9, 15): 27.73,
+        datetime(2015, 9, 16): 27.69, datetime(2015, 9, 17): 27.66,
+        datetime(2015, 9, 18): 27.62, datetime(2015, 9, 21): 27.35,
+        datetime(2015, 9, 22): 27.32, datetime(2015, 9, 23): 27.27,
+        datetime(2015, 9, 24): 26.59, datetime(2015, 9, 25): 26.42,
+        datetime(2015, 9, 28): 26.64, datetime(2015, 9, 29): 27.21,
+        datetime(2015, 9, 30): 27.25,
+        # October 2015
+        datetime(2015, 10, 1): 27.04, datetime(2015, 10, 2): 27.55,
+        datetime(2015, 10, 5): 27.75, datetime(2015, 10, 6): 28.27,
+        datetime(2015, 10, 7): 28.37, datetime(2015, 10, 8): 28.74,
+        datetime(2015, 10, 9): 28.82, datetime(2015, 10, 12): 28.95,
+        datetime(2015, 10, 13): 28.86, datetime(2015, 10, 14): 28.71,
+        datetime(2015, 10, 15): 29.02, datetime(2015, 10, 16): 29.36,
+        datetime(2015, 10, 19): 29.52, datetime(2015, 10, 20): 29.56,
+        datetime(2015, 10, 21): 29.60, datetime(2015, 10, 22): 29.64,
+        datetime(2015, 10, 23): 29.46, datetime(2015, 10, 26): 29.35,
+        datetime(2015, 10, 27): 28.96, datetime(2015, 10, 28): 29.09,
+        datetime(2015, 10, 29): 28.47, datetime(2015, 10, 30): 28.06,
+    })
+
+
+@lru_cache(maxsize=1)
+def _load_kraft_heinz_avg_prices() -> Mapping[datetime, float]:
+    """Load Kraft Heinz average closing prices from Table B"""
+    # Sample data - full table would be loaded from settlement notice.
+    # Seeded so the simulated table is identical across calculators.
+    rng = np.random.default_rng(0)
+    avg_prices = {}
+    current_date = datetime(2019, 8, 8)
+    end_date = datetime(2019, 11, 5)
+    base_price = 28.22
+    
+    while current_date <= end_date:
+        # Simulate price fluctuations
+        if current_date.weekday() < 5:  # Weekdays only
+            avg_prices[current_date] = base_price
+            # Slight random variation
+            base_price += (rng.random() - 0.5) * 0.5
+            base_price = max(27.0, min(29.0, base_price))
+        current_date += timedelta(days=1)
+    
+    avg_prices[datetime(2019, 11, 5)] = 27.55  # Final average
+    return MappingProxyType(avg_prices)
+
+
+@lru_cache(maxsize=None)
+def _avg_price_table(settlement_type: SettlementType) -> Tuple[Mapping[datetime, float], np.ndarray, np.ndarray]:
+    """
+    Average closing prices for a settlement, with sorted parallel date and
+    price arrays for array lookups. Built once per process and read-only.
+    """
+    if settlement_type == SettlementType.TWITTER:
+        prices = _load_twitter_avg_prices()
+    else:
+        prices = _load_kraft_heinz_avg_prices()
+    
+    sorted_dates = sorted(prices)
+    dates = np.array(sorted_dates, dtype='datetime64[us]')
+    values = np.array([prices[d] for d in sorted_dates], dtype=np.float64)
+    dates.flags.writeable = False
+    values.flags.writeable = False
+    return prices, dates, values
 
 
 class SettlementCalculator:
@@ -112,6 +356,20 @@ class SettlementCalculator:
         self.matches: List[MatchResult] = []
         self.inventory: List[Transaction] = []
         
+        # Shared category indexes for the dictionary-encoded entity/fund names
+        self.entity_categories: pd.Index = pd.Index([], dtype=object)
+        self.fund_categories: pd.Index = pd.Index([], dtype=object)
+        
+        # Results derived from self.matches, rebuilt only when the matches change
+        self._matches_version = 0
+        self._results_cache_key = None
+        self._matches_df: Optional[pd.DataFrame] = None
+        self._entity_summary: Optional[Dict[str, Any]] = None
+        self._fund_summary: Optional[Dict[str, Any]] = None
+        self._match_amounts_cache: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        # (loss, quantity) arrays of kept matches, filled while matching
+        self._amount_parts: List[Tuple[np.ndarray, np.ndarray]] = []
+        
         # Initialize configuration based on settlement type
         self._initialize_configuration()
         
@@ -121,8 +379,29 @@ class SettlementCalculator:
         """Initialize settlement-specific configuration"""
         if self.settlement_type == SettlementType.TWITTER:
             self._initialize_twitter_config()
+            first_corrective_date = self.first_corrective_date
         else:
             self._initialize_kraft_heinz_config()
+            first_corrective_date = self.corrective_dates[0]
+        
+        # Key dates as datetime64 scalars for array comparisons
+        self.class_start_np = np.datetime64(self.class_start, 'us')
+        self.class_end_np = np.datetime64(self.class_end, 'us')
+        self.lookback_start_np = np.datetime64(self.lookback_start, 'us')
+        self.lookback_end_np = np.datetime64(self.lookback_end, 'us')
+        self.first_corrective_date_np = np.datetime64(first_corrective_date, 'us')
+        
+        # Integer (epoch microsecond) class period edges for scalar checks
+        self._class_start_us = to_epoch_us(self.class_start)
+        self._class_end_us = to_epoch_us(self.class_end)
+        
+        # Settlement scalars shared by every loss kernel call
+        self._kernel_args = (
+            self._class_start_us, self._class_end_us,
+            int(self.first_corrective_date_np.astype(np.int64)),
+            int(self.lookback_start_np.astype(np.int64)), int(self.lookback_end_np.astype(np.int64)),
+            float(self.average_price)
+        )
     
     def _initialize_twitter_config(self):
         """Initialize Twitter settlement configuration"""
@@ -134,6 +413,7 @@ class SettlementCalculator:
         self.first_corrective_date = datetime(2015, 4, 28)
         self.first_corrective_time_str = "15:07"  # 3:07 PM EDT
         self.price_threshold = 50.45  # Price threshold for 4/28/15
+        self._apr28_ord = self.first_corrective_date.toordinal()
         
         # Lookback period: August 3, 2015 - October 30, 2015
         self.lookback_start = datetime(2015, 8, 3)
@@ -156,60 +436,26 @@ class SettlementCalculator:
                      datetime(2015, 8, 1), datetime(2025, 12, 31), 5),
         ]
         
+        # Sorted group boundaries as int64 microseconds since the epoch so a
+        # date resolves by binary search on the end edges with plain integer
+        # compares (groups are closed intervals and may leave gaps between)
+        self._tg_starts_us = np.array([to_epoch_us(g.start) for g in self.time_groups], dtype=np.int64)
+        self._tg_ends_us = np.array([to_epoch_us(g.end) for g in self.time_groups], dtype=np.int64)
+        self._tg_starts_us_list = self._tg_starts_us.tolist()
+        self._tg_ends_us_list = self._tg_ends_us.tolist()
+        self._tg_indices_np = np.array([g.index for g in self.time_groups], dtype=np.int64)
+        
         # Decline matrix from Table 1 in settlement notice
-        self.decline_matrix = {
-            (0, 0): 0.00,   (0, 1): 8.97,   (0, 2): 12.93,
-            (0, 3): 18.27,  (0, 4): 18.69,  (0, 5): 20.34,
-            (1, 0): 0.00,   (1, 1): 0.00,   (1, 2): 3.96,
-            (1, 3): 9.30,   (1, 4): 9.72,   (1, 5): 11.37,
-            (2, 0): 0.00,   (2, 1): 0.00,   (2, 2): 0.00,
-            (2, 3): 5.34,   (2, 4): 5.76,   (2, 5): 7.41,
-        }
+        # Rows: purchase time group, columns: sale time group
+        self.decline_matrix = np.array([
+            [0.00, 8.97, 12.93, 18.27, 18.69, 20.34],
+            [0.00, 0.00,  3.96,  9.30,  9.72, 11.37],
+            [0.00, 0.00,  0.00,  5.34,  5.76,  7.41],
+        ], dtype=np.float64)
         
         # Average closing prices (full table from settlement notice Table 2)
-        self.avg_closing_prices = self._load_twitter_avg_prices()
-    
-    def _load_twitter_avg_prices(self) -> Dict[datetime, float]:
-        """Load Twitter average closing prices from Table 2"""
-        # Full table from Twitter settlement notice Table 2
-        return {
-            # August 2015
-            datetime(2015, 8, 3): 29.27, datetime(2015, 8, 4): 29.31,
-            datetime(2015, 8, 5): 29.03, datetime(2015, 8, 6): 28.66,
-            datetime(2015, 8, 7): 28.33, datetime(2015, 8, 10): 28.35,
-            datetime(2015, 8, 11): 28.33, datetime(2015, 8, 12): 28.59,
-            datetime(2015, 8, 13): 28.45, datetime(2015, 8, 14): 28.40,
-            datetime(2015, 8, 17): 28.23, datetime(2015, 8, 18): 28.48,
-            datetime(2015, 8, 19): 27.94, datetime(2015, 8, 20): 27.72,
-            datetime(2015, 8, 21): 27.37, datetime(2015, 8, 24): 26.47,
-            datetime(2015, 8, 25): 26.60, datetime(2015, 8, 26): 26.94,
-            datetime(2015, 8, 27): 27.73, datetime(2015, 8, 28): 27.74,
-            datetime(2015, 8, 31): 27.87,
-            # September 2015
-            datetime(2015, 9, 1): 26.87, datetime(2015, 9, 2): 27.27,
-            datetime(2015, 9, 3): 27.69, datetime(2015, 9, 4): 27.02,
-            datetime(2015, 9, 8): 27.63, datetime(2015, 9, 9): 27.92,
-            datetime(2015, 9, 10): 27.83, datetime(2015, 9, 11): 27.79,
-            datetime(2015, 9, 14): 27.63, datetime(2015, 9, 15): 27.73,
-            datetime(2015, 9, 16): 27.69, datetime(2015, 9, 17): 27.66,
-            datetime(2015, 9, 18): 27.62, datetime(2015, 9, 21): 27.35,
-            datetime(2015, 9, 22): 27.32, datetime(2015, 9, 23): 27.27,
-            datetime(2015, 9, 24): 26.59, datetime(2015, 9, 25): 26.42,
-            datetime(2015, 9, 28): 26.64, datetime(2015, 9, 29): 27.21,
-            datetime(2015, 9, 30): 27.25,
-            # October 2015
-            datetime(2015, 10, 1): 27.04, datetime(2015, 10, 2): 27.55,
-            datetime(2015, 10, 5): 27.75, datetime(2015, 10, 6): 28.27,
-            datetime(2015, 10, 7): 28.37, datetime(2015, 10, 8): 28.74,
-            datetime(2015, 10, 9): 28.82, datetime(2015, 10, 12): 28.95,
-            datetime(2015, 10, 13): 28.86, datetime(2015, 10, 14): 28.71,
-            datetime(2015, 10, 15): 29.02, datetime(2015, 10, 16): 29.36,
-            datetime(2015, 10, 19): 29.52, datetime(2015, 10, 20): 29.56,
-            datetime(2015, 10, 21): 29.60, datetime(2015, 10, 22): 29.64,
-            datetime(2015, 10, 23): 29.46, datetime(2015, 10, 26): 29.35,
-            datetime(2015, 10, 27): 28.96, datetime(2015, 10, 28): 29.09,
-            datetime(2015, 10, 29): 28.47, datetime(2015, 10, 30): 28.06,
-        }
+        self.avg_closing_prices, self._avg_dates, self._avg_vals = \
+            _avg_price_table(SettlementType.TWITTER)
     
     def _initialize_kraft_heinz_config(self):
         """Initialize Kraft Heinz settlement configuration"""
@@ -238,33 +484,40 @@ class SettlementCalculator:
             InflationPeriod(datetime(2019, 2, 22), datetime(2019, 8, 7), 4.04, 
                           "2/22/2019 - 8/7/2019"),
             InflationPeriod(datetime(2019, 8, 8), datetime(2019, 8, 8), 1.33, 
-                          "8/8/2019 (sale only)"),
+                          "8/8/2019 (sale only)", sale_only=True),
             InflationPeriod(datetime(2019, 8, 9), datetime(2025, 12, 31), 0.00, 
                           "After 8/8/2019"),
         ]
         
+        # Sorted period edges for binary search; a sale-only period carries
+        # no inflation for purchases
+        self._infl_starts = [p.start for p in self.inflation_periods]
+        self._infl_ends = [p.end for p in self.inflation_periods]
+        self._infl_vals_sale = [p.inflation for p in self.inflation_periods]
+        self._infl_vals_buy = [0.0 if p.sale_only else p.inflation
+                               for p in self.inflation_periods]
+        self._infl_starts_us = [to_epoch_us(start) for start in self._infl_starts]
+        self._infl_ends_us = [to_epoch_us(end) for end in self._infl_ends]
+        self._infl_starts_np = np.array(self._infl_starts, dtype='datetime64[us]')
+        self._infl_ends_np = np.array(self._infl_ends, dtype='datetime64[us]')
+        self._infl_vals_sale_np = np.array(self._infl_vals_sale, dtype=np.float64)
+        self._infl_vals_buy_np = np.array(self._infl_vals_buy, dtype=np.float64)
+        
         # Average closing prices (full table from Table B)
-        self.avg_closing_prices = self._load_kraft_heinz_avg_prices()
+        self.avg_closing_prices, self._avg_dates, self._avg_vals = \
+            _avg_price_table(SettlementType.KRAFT_HEINZ)
     
-    def _load_kraft_heinz_avg_prices(self) -> Dict[datetime, float]:
-        """Load Kraft Heinz average closing prices from Table B"""
-        # Sample data - full table would be loaded from settlement notice
-        avg_prices = {}
-        current_date = datetime(2019, 8, 8)
-        end_date = datetime(2019, 11, 5)
-        base_price = 28.22
-        
-        while current_date <= end_date:
-            # Simulate price fluctuations
-            if current_date.weekday() < 5:  # Weekdays only
-                avg_prices[current_date] = base_price
-                # Slight random variation
-                base_price += (np.random.random() - 0.5) * 0.5
-                base_price = max(27.0, min(29.0, base_price))
-            current_date += timedelta(days=1)
-        
-        avg_prices[datetime(2019, 11, 5)] = 27.55  # Final average
-        return avg_prices
+    def _avg_price_lookup(self, sale_dates: np.ndarray) -> np.ndarray:
+        """
+        Average closing price for each sale date, falling back to the
+        90-day average when the date is not in the table
+        """
+        sale_dates = np.asarray(sale_dates, dtype='datetime64[us]')
+        if len(self._avg_dates) == 0:
+            return np.full(sale_dates.shape, self.average_price, dtype=np.float64)
+        
+        idx = np.minimum(np.searchsorted(self._avg_dates, sale_dates), len(self._avg_dates) - 1)
+        return np.where(self._avg_dates[idx] == sale_dates, self._avg_vals[idx], self.average_price)
     
     def _parse_date(self, date_input: Union[str, datetime]) -> Optional[datetime]:
         """Parse date from various formats"""
@@ -278,26 +531,48 @@ class SettlementCalculator:
             date_str = str(date_input).strip()
             
             # Try common formats
-            formats = [
-                '%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', 
-                '%d/%m/%Y', '%Y%m%d', '%m-%d-%Y',
-                '%Y-%m-%d %H:%M:%S', '%m/%d/%Y %H:%M:%S',
-                '%Y-%m-%d %H:%M', '%m/%d/%Y %H:%M'
-            ]
-            
-            for fmt in formats:
+            for fmt in DATE_FORMATS:
                 try:
                     return datetime.strptime(date_str, fmt)
                 except ValueError:
                     continue
             
             # Try pandas to_datetime as fallback
-            return pd.to_datetime(date_str)
+            return _to_wall_time(pd.to_datetime(date_str))
             
         except Exception as e:
             logger.error(f"Date parsing error for '{date_input}': {str(e)}")
             return None
     
+    def _parse_date_series(self, values: Union[pd.Series, np.ndarray]) -> pd.Series:
+        """
+        Parse a whole column of dates at once
+
+        Vectorized counterpart of _parse_date: each format is tried with a
+        single pd.to_datetime call on the rows still unresolved, in the same
+        order as the scalar parser. Unparseable or missing values become NaT.
+        """
+        series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+        if pd.api.types.is_datetime64_dtype(series):
+            return series
+
+        text = series.astype('string').str.strip()
+        parsed = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+
+        for fmt in DATE_FORMATS:
+            pending = parsed.isna() & text.notna()
+            if not pending.any():
+                return parsed
+            parsed[pending] = pd.to_datetime(text[pending], format=fmt, errors='coerce')
+
+        # Fall back to per-element inference for anything left over
+        pending = parsed.isna() & text.notna()
+        if pending.any():
+            parsed[pending] = text[pending].map(
+                lambda value: _to_wall_time(pd.to_datetime(value, errors='coerce')))
+
+        return parsed
+    
     def _get_time_group_index(self, date: datetime, for_sale: bool = False) -> int:
         """
         Get time group index for a given date (Twitter specific)
@@ -306,7 +581,7 @@ class SettlementCalculator:
             return -1
         
         # Special handling for 4/28/2015
-        if date.date() == datetime(2015, 4, 28).date():
+        if date.toordinal() == self._apr28_ord:
             # For sales with exact time
             if for_sale and date.hour > 0:
                 if date.hour >= 15 and date.minute >= 7:
@@ -314,13 +589,34 @@ class SettlementCalculator:
                 else:
                     return 0  # Before 3:07 PM
         
-        # Check other time groups
-        for group in self.time_groups:
-            if group.start <= date <= group.end:
-                return group.index
+        # Check other time groups (same integer edges as _get_time_group_indices)
+        ts = to_epoch_us(date)
+        pos = bisect_left(self._tg_ends_us_list, ts)
+        if pos < len(self._tg_ends_us_list) and self._tg_starts_us_list[pos] <= ts:
+            return self.time_groups[pos].index
         
         return -1
     
+    def _get_time_group_indices(self, dates: np.ndarray) -> np.ndarray:
+        """
+        Vectorized time group lookup for an array of dates (Twitter specific)
+        
+        Mirrors _get_time_group_index without the 4/28/2015 sale-time special
+        case. Accepts datetime64 values or int64 microseconds since the epoch;
+        dates outside every group (and NaT) resolve to -1.
+        """
+        dates = np.asarray(dates)
+        if dates.dtype.kind == 'M':
+            dates = dates.astype('datetime64[us]').view(np.int64)
+        if self.settlement_type != SettlementType.TWITTER:
+            return np.full(dates.shape, -1, dtype=np.int64)
+        
+        pos = np.searchsorted(self._tg_ends_us, dates, side='left')
+        in_range = pos < len(self._tg_ends_us)
+        pos = np.minimum(pos, len(self._tg_ends_us) - 1)
+        found = in_range & (self._tg_starts_us[pos] <= dates)
+        return np.where(found, self._tg_indices_np[pos], -1)
+    
     def _get_decline_amount(self, purchase_date: datetime, sale_date: datetime, 
                            sale_price: Optional[float] = None) -> float:
         """
@@ -332,7 +628,7 @@ class SettlementCalculator:
         purchase_idx = self._get_time_group_index(purchase_date, for_sale=False)
         
         # Special handling for 4/28/2015 sales
-        if sale_date.date() == datetime(2015, 4, 28).date():
+        if sale_date.toordinal() == self._apr28_ord:
             if sale_price and sale_price >= self.price_threshold:
                 sale_idx = 0  # Before 3:07 PM
             else:
@@ -344,7 +640,10 @@ class SettlementCalculator:
         else:
             sale_idx = self._get_time_group_index(sale_date, for_sale=True)
         
-        return self.decline_matrix.get((purchase_idx, sale_idx), 0.0)
+        n_purchase_groups, n_sale_groups = self.decline_matrix.shape
+        if 0 <= purchase_idx < n_purchase_groups and 0 <= sale_idx < n_sale_groups:
+            return float(self.decline_matrix[purchase_idx, sale_idx])
+        return 0.0
     
     def _get_inflation_at_date(self, date: datetime, is_sale: bool = False) -> float:
         """
@@ -353,81 +652,390 @@ class SettlementCalculator:
         if self.settlement_type != SettlementType.KRAFT_HEINZ:
             return 0.0
         
-        for period in self.inflation_periods:
-            if period.start <= date <= period.end:
-                # Special handling for 8/8/2019 sale-only inflation
-                if period.name == "8/8/2019 (sale only)" and not is_sale:
-                    continue
-                return period.inflation
+        ts = to_epoch_us(date)
+        idx = bisect_right(self._infl_starts_us, ts) - 1
+        if idx >= 0 and ts <= self._infl_ends_us[idx]:
+            return self._infl_vals_sale[idx] if is_sale else self._infl_vals_buy[idx]
         
         return 0.0
     
+    def _get_inflation_at_dates(self, dates: np.ndarray, is_sale: bool = False) -> np.ndarray:
+        """
+        Vectorized _get_inflation_at_date for an array of dates (Kraft Heinz
+        specific); NaT and dates outside every period resolve to 0.0
+        """
+        dates = np.asarray(dates, dtype='datetime64[us]')
+        if self.settlement_type != SettlementType.KRAFT_HEINZ:
+            return np.zeros(dates.shape, dtype=np.float64)
+        
+        values = self._infl_vals_sale_np if is_sale else self._infl_vals_buy_np
+        idx = np.searchsorted(self._infl_starts_np, dates, side='right') - 1
+        safe_idx = np.maximum(idx, 0)
+        found = (idx >= 0) & (dates <= self._infl_ends_np[safe_idx])
+        return np.where(found, values[safe_idx], 0.0)
+    
     def calculate_recognized_loss_per_share(self, purchase_date: datetime, 
                                            purchase_price: float,
                                            sale_date: Optional[datetime], 
                                            sale_price: Optional[float]) -> Dict[str, Any]:
         """
         Calculate recognized loss per share
+        
+        Passing NumPy arrays of dates and prices (NaT sale dates for held
+        shares) takes the vectorized path and returns a dict of arrays, see
+        _calculate_losses_batch.
         """
-        # Check if purchase is in class period
-        if purchase_date < self.class_start or purchase_date > self.class_end:
+        if isinstance(purchase_date, np.ndarray):
+            return self._calculate_losses_batch(purchase_date, purchase_price,
+                                                sale_date, sale_price)
+        
+        recognized_loss, code = self._calculate_recognized_loss_fast(
+            purchase_date, purchase_price, sale_date, sale_price)
+        return self._explain(code, recognized_loss, purchase_date, purchase_price,
+                             sale_date, sale_price)
+    
+    def _calculate_recognized_loss_fast(self, purchase_date: datetime, purchase_price: float,
+                                        sale_date: Optional[datetime],
+                                        sale_price: Optional[float]) -> Tuple[float, int]:
+        """Recognized loss per share and its RuleCode, without building any details"""
+        purchase_ts = to_epoch_us(purchase_date)
+        if purchase_ts < self._class_start_us or purchase_ts > self._class_end_us:
+            return 0.0, RuleCode.OUTSIDE_PERIOD
+        
+        sale_ts = to_epoch_us(sale_date)
+        sale_price = np.nan if sale_price is None else float(sale_price)
+        
+        if self.settlement_type == SettlementType.TWITTER:
+            decline, avg_price = self._twitter_loss_inputs(purchase_date, sale_date, sale_price)
+            recognized_loss, code = twitter_loss_kernel(
+                purchase_ts, float(purchase_price), sale_ts, sale_price,
+                decline, avg_price, *self._kernel_args
+            )
+        else:
+            purchase_inflation, sale_inflation, avg_price = \
+                self._kraft_heinz_loss_inputs(purchase_date, sale_date)
+            recognized_loss, code = kh_loss_kernel(
+                purchase_ts, float(purchase_price), sale_ts, sale_price,
+                purchase_inflation, sale_inflation, avg_price, *self._kernel_args
+            )
+        
+        return recognized_loss, code
+    
+    def _explain(self, code: int, recognized_loss: float, purchase_date: datetime,
+                 purchase_price: float, sale_date: Optional[datetime],
+                 sale_price: Optional[float]) -> Dict[str, Any]:
+        """Rebuild the rule text and details for a result of the fast path"""
+        if code == RuleCode.OUTSIDE_PERIOD:
             return {
                 'recognized_loss': 0.0,
-                'rule_applied': 'Purchase outside class period',
+                'rule_applied': _RULE_MSG_OUTSIDE_PERIOD,
                 'rule_code': 'OUTSIDE_PERIOD',
                 'details': {}
             }
         
         if self.settlement_type == SettlementType.TWITTER:
-            return self._calculate_twitter_loss(purchase_date, purchase_price, 
-                                               sale_date, sale_price)
+            return self._explain_twitter_loss(code, recognized_loss, purchase_date,
+                                              purchase_price, sale_date, sale_price)
         else:
-            return self._calculate_kraft_heinz_loss(purchase_date, purchase_price,
-                                                   sale_date, sale_price)
+            return self._explain_kraft_heinz_loss(code, recognized_loss, purchase_date,
+                                                  purchase_price, sale_date, sale_price)
     
-    def _calculate_twitter_loss(self, purchase_date: datetime, purchase_price: float,
-                               sale_date: Optional[datetime], 
-                               sale_price: Optional[float]) -> Dict[str, Any]:
-        """Calculate loss using Twitter settlement rules"""
+    def _calculate_losses_batch(self, purchase_dates: np.ndarray, purchase_prices: np.ndarray,
+                                sale_dates: np.ndarray, sale_prices: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Calculate recognized loss per share for many purchase/sale pairs at once
         
-        # Shares held (not sold)
-        if sale_date is None:
-            # Rule (d): Held shares
-            decline = self._get_decline_amount(purchase_date, self.lookback_start)
-            held_loss = max(0.0, purchase_price - self.average_price)
-            recognized_loss = min(decline, held_loss)
+        Vectorized counterpart of calculate_recognized_loss_per_share. Held
+        shares are marked by NaT sale dates (their sale prices are ignored).
+        Returns a dict of parallel arrays: 'recognized_loss', integer
+        'rule_code' (see api.kernels) and the intermediate amounts used to
+        explain each result.
+        """
+        purchase_dates = np.asarray(purchase_dates, dtype='datetime64[us]')
+        sale_dates = np.asarray(sale_dates, dtype='datetime64[us]')
+        purchase_prices = np.asarray(purchase_prices, dtype=np.float64)
+        sale_prices = np.asarray(sale_prices, dtype=np.float64)
+        
+        held = np.isnat(sale_dates)
+        
+        # Average closing price on the sale date, else the 90-day average
+        avg_price = self._avg_price_lookup(sale_dates)
+        
+        # Python min/max semantics: fmin/fmax ignore a NaN price like min()/max() do
+        actual_loss = np.fmax(0.0, purchase_prices - sale_prices)
+        held_loss = np.fmax(0.0, purchase_prices - self.average_price)
+        lookback_loss = np.fmax(0.0, purchase_prices - avg_price)
+        
+        if self.settlement_type == SettlementType.TWITTER:
+            # Held shares are measured against the lookback start
+            effective_sale_dates = np.where(held, self.lookback_start_np, sale_dates)
+            decline = self._get_decline_amounts(purchase_dates, effective_sale_dates, sale_prices)
+            held_loss_cap = decline
+            rule_b = sale_dates < self.lookback_start_np
+            amounts = {'decline_amount': decline}
+        else:
+            purchase_inflation = self._get_inflation_at_dates(purchase_dates, is_sale=False)
+            sale_inflation = self._get_inflation_at_dates(sale_dates, is_sale=True)
+            
+            decline = np.fmax(0.0, purchase_inflation - sale_inflation)
+            held_loss_cap = purchase_inflation
+            rule_b = sale_dates <= self.class_end_np
+            amounts = {
+                'purchase_inflation': purchase_inflation,
+                'sale_inflation': sale_inflation,
+                'inflation_decline': decline,
+            }
+        
+        if NUMBA_AVAILABLE:
+            # One fused parallel pass of the scalar kernel instead of the
+            # mask-and-select passes below (datetime64[us] views as the
+            # kernels' epoch microseconds, NaT as NAT)
+            purchase_ts = purchase_dates.view(np.int64)
+            sale_ts = sale_dates.view(np.int64)
+            if self.settlement_type == SettlementType.TWITTER:
+                recognized_loss, rule_code = twitter_loss_batch(
+                    purchase_ts, purchase_prices, sale_ts, sale_prices,
+                    decline, avg_price, *self._kernel_args
+                )
+            else:
+                recognized_loss, rule_code = kh_loss_batch(
+                    purchase_ts, purchase_prices, sale_ts, sale_prices,
+                    purchase_inflation, sale_inflation, avg_price, *self._kernel_args
+                )
+        else:
+            outside = (purchase_dates < self.class_start_np) | (purchase_dates > self.class_end_np)
+            rule_a = sale_dates < self.first_corrective_date_np
+            rule_c = (sale_dates >= self.lookback_start_np) & (sale_dates <= self.lookback_end_np)
+            
+            conditions = [outside, held, rule_a, rule_b, rule_c]
+            rule_code = np.select(
+                conditions,
+                [RULE_OUTSIDE_PERIOD, RULE_D, RULE_A, RULE_B, RULE_C],
+                default=RULE_POST_LOOKBACK
+            ).astype(np.int8)
+            sold_loss = np.fmin(decline, actual_loss)
+            recognized_loss = np.select(
+                conditions,
+                [0.0, np.fmin(held_loss_cap, held_loss), 0.0, sold_loss,
+                 np.fmin(sold_loss, lookback_loss)],
+                default=sold_loss
+            )
+        
+        return {
+            'recognized_loss': recognized_loss,
+            'rule_code': rule_code,
+            'actual_loss': actual_loss,
+            'held_loss': held_loss,
+            'lookback_loss': lookback_loss,
+            'avg_closing_price': avg_price,
+            **amounts,
+        }
+    
+    def _get_decline_amounts(self, purchase_dates: np.ndarray, sale_dates: np.ndarray,
+                             sale_prices: np.ndarray) -> np.ndarray:
+        """Vectorized _get_decline_amount (Twitter specific)"""
+        purchase_idx = self._get_time_group_indices(purchase_dates)
+        sale_idx = self._get_time_group_indices(sale_dates)
+        
+        # Special handling for 4/28/2015 sales (see _get_decline_amount)
+        sale_days = sale_dates.astype('datetime64[D]')
+        on_apr28 = sale_days == np.datetime64('2015-04-28')
+        if on_apr28.any():
+            minutes = (sale_dates - sale_days).astype('timedelta64[m]').astype(np.int64)
+            hours, mins = minutes // 60, minutes % 60
+            apr28_idx = np.select(
+                [sale_prices >= self.price_threshold, hours > 0],
+                [0, np.where((hours >= 15) & (mins >= 7), 1, 0)],
+                default=1
+            )
+            sale_idx = np.where(on_apr28, apr28_idx, sale_idx)
+        
+        n_purchase_groups, n_sale_groups = self.decline_matrix.shape
+        valid = ((purchase_idx >= 0) & (purchase_idx < n_purchase_groups) &
+                 (sale_idx >= 0) & (sale_idx < n_sale_groups))
+        return np.where(
+            valid,
+            self.decline_matrix[np.clip(purchase_idx, 0, n_purchase_groups - 1),
+                                np.clip(sale_idx, 0, n_sale_groups - 1)],
+            0.0
+        )
+    
+    def _calculate_held_batch(self, purchase_dates: np.ndarray,
+                              purchase_prices: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        _calculate_losses_batch for held lots only (rule D)
+        
+        Each lot is independent, so the capped loss runs in the parallel
+        held_loss_batch kernel when numba is installed. Returns the same
+        keys as _calculate_losses_batch.
+        """
+        n = len(purchase_dates)
+        outside = (purchase_dates < self.class_start_np) | (purchase_dates > self.class_end_np)
+        
+        if self.settlement_type == SettlementType.TWITTER:
+            # Held shares are measured against the lookback start
+            loss_cap = self._get_decline_amounts(
+                purchase_dates, np.full(n, self.lookback_start_np), np.full(n, np.nan))
+            amounts = {'decline_amount': loss_cap}
+        else:
+            loss_cap = self._get_inflation_at_dates(purchase_dates, is_sale=False)
+            amounts = {
+                'purchase_inflation': loss_cap,
+                'sale_inflation': np.zeros(n),
+                'inflation_decline': np.fmax(0.0, loss_cap),
+            }
+        
+        if NUMBA_AVAILABLE:
+            recognized_loss, held_loss = held_loss_batch(purchase_prices, loss_cap,
+                                                         self.average_price)
+        else:
+            held_loss = np.fmax(0.0, purchase_prices - self.average_price)
+            recognized_loss = np.fmin(loss_cap, held_loss)
+        
+        return {
+            'recognized_loss': np.where(outside, 0.0, recognized_loss),
+            'rule_code': np.where(outside, RULE_OUTSIDE_PERIOD, RULE_D).astype(np.int8),
+            'actual_loss': np.zeros(n),
+            'held_loss': held_loss,
+            # With no sale date the lookback average is the 90-day average
+            'lookback_loss': held_loss,
+            'avg_closing_price': np.full(n, self.average_price),
+            **amounts,
+        }
+    
+    def calculate_recognized_loss_vec(self, purchase_dates: np.ndarray, purchase_prices: np.ndarray,
+                                      sale_dates: np.ndarray, sale_prices: np.ndarray
+                                      ) -> Tuple[np.ndarray, np.ndarray, List[str], List[Dict[str, Any]]]:
+        """
+        Vectorized calculate_recognized_loss_per_share
+        
+        Returns (recognized loss per share, integer rule codes, rule_applied
+        texts, details dicts), one entry per purchase/sale pair. Held shares
+        are marked by NaT sale dates.
+        """
+        batch = self._calculate_losses_batch(purchase_dates, purchase_prices,
+                                             sale_dates, sale_prices)
+        rows = np.arange(len(batch['recognized_loss']))
+        _, rule_applied, details = self._explain_batch(batch, rows)
+        return batch['recognized_loss'], batch['rule_code'], rule_applied, details
+    
+    def _explain_batch(self, batch: Dict[str, np.ndarray],
+                       rows: np.ndarray) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        """
+        Rule codes, rule texts and details for selected rows of a batch result
+        
+        Batch counterpart of _explain, built from the intermediate amounts
+        returned by _calculate_losses_batch.
+        """
+        twitter = self.settlement_type == SettlementType.TWITTER
+        messages = _RULE_MSG_TWITTER if twitter else _RULE_MSG_KRAFT_HEINZ
+        first_corrective = (self.first_corrective_date if twitter
+                            else self.corrective_dates[0]).isoformat()
+        
+        codes = batch['rule_code'][rows].tolist()
+        column = {key: values[rows].tolist() for key, values in batch.items()
+                  if key not in ('recognized_loss', 'rule_code')}
+        actual_loss = column['actual_loss']
+        lookback_loss = column['lookback_loss']
+        avg_price = column['avg_closing_price']
+        
+        rule_codes = [None] * len(codes)
+        rule_applied = [None] * len(codes)
+        details = [None] * len(codes)
+        for i, code in enumerate(codes):
+            if code == RULE_OUTSIDE_PERIOD:
+                rule_codes[i] = 'OUTSIDE_PERIOD'
+                rule_applied[i] = _RULE_MSG_OUTSIDE_PERIOD
+                details[i] = {}
+                continue
             
+            rule_codes[i] = RuleCode(code).name
+            rule_applied[i] = messages[code]
+            if code == RULE_A:
+                details[i] = {'first_corrective_date': first_corrective}
+            elif twitter:
+                decline = column['decline_amount'][i]
+                if code == RULE_D:
+                    details[i] = {
+                        'decline_amount': decline,
+                        'held_loss': column['held_loss'][i],
+                        'average_price': self.average_price
+                    }
+                elif code == RULE_C:
+                    details[i] = {
+                        'decline_amount': decline,
+                        'actual_loss': actual_loss[i],
+                        'lookback_loss': lookback_loss[i],
+                        'avg_closing_price': avg_price[i]
+                    }
+                else:
+                    details[i] = {'decline_amount': decline, 'actual_loss': actual_loss[i]}
+            else:
+                purchase_inflation = column['purchase_inflation'][i]
+                if code == RULE_D:
+                    details[i] = {
+                        'purchase_inflation': purchase_inflation,
+                        'held_loss': column['held_loss'][i],
+                        'average_price': self.average_price
+                    }
+                    continue
+                details[i] = {
+                    'purchase_inflation': purchase_inflation,
+                    'sale_inflation': column['sale_inflation'][i],
+                    'inflation_decline': column['inflation_decline'][i],
+                    'actual_loss': actual_loss[i]
+                }
+                if code == RULE_C:
+                    details[i]['lookback_loss'] = lookback_loss[i]
+                    details[i]['avg_closing_price'] = avg_price[i]
+        
+        return rule_codes, rule_applied, details
+    
+    def _twitter_loss_inputs(self, purchase_date: datetime, sale_date: Optional[datetime],
+                             sale_price: Optional[float]) -> Tuple[float, float]:
+        """Decline amount and average closing price for a Twitter match"""
+        if sale_date is None:
+            # Held shares: decline is measured against the lookback start
+            return (self._get_decline_amount(purchase_date, self.lookback_start),
+                    self.average_price)
+        return (self._get_decline_amount(purchase_date, sale_date, sale_price),
+                self.avg_closing_prices.get(sale_date, self.average_price))
+    
+    def _explain_twitter_loss(self, code: int, recognized_loss: float,
+                              purchase_date: datetime, purchase_price: float,
+                              sale_date: Optional[datetime],
+                              sale_price: Optional[float]) -> Dict[str, Any]:
+        """Result dict for a Twitter settlement match"""
+        decline, avg_price = self._twitter_loss_inputs(purchase_date, sale_date, sale_price)
+        
+        if code == RULE_D:
             return {
                 'recognized_loss': round(recognized_loss, 4),
-                'rule_applied': f'Rule (d): Held shares',
+                'rule_applied': _RULE_MSG_TWITTER[RuleCode.D],
                 'rule_code': 'D',
                 'details': {
                     'decline_amount': decline,
-                    'held_loss': held_loss,
+                    'held_loss': max(0.0, purchase_price - self.average_price),
                     'average_price': self.average_price
                 }
             }
         
-        # Rule (a): Sold before first corrective disclosure
-        if sale_date < self.first_corrective_date:
+        if code == RULE_A:
             return {
                 'recognized_loss': 0.0,
-                'rule_applied': 'Rule (a): Sold before first corrective disclosure',
+                'rule_applied': _RULE_MSG_TWITTER[RuleCode.A],
                 'rule_code': 'A',
                 'details': {
                     'first_corrective_date': self.first_corrective_date.isoformat()
                 }
             }
         
-        decline = self._get_decline_amount(purchase_date, sale_date, sale_price)
         actual_loss = max(0.0, purchase_price - sale_price)
         
-        # Rule (b): Sold between first corrective and lookback start
-        if sale_date < self.lookback_start:
-            recognized_loss = min(decline, actual_loss)
+        if code == RULE_B:
             return {
                 'recognized_loss': round(recognized_loss, 4),
-                'rule_applied': f'Rule (b): Sold during class period after corrective disclosure',
+                'rule_applied': _RULE_MSG_TWITTER[RuleCode.B],
                 'rule_code': 'B',
                 'details': {
                     'decline_amount': decline,
@@ -435,29 +1043,23 @@ class SettlementCalculator:
                 }
             }
         
-        # Rule (c): Sold during lookback period
-        if self.lookback_start <= sale_date <= self.lookback_end:
-            avg_price = self.avg_closing_prices.get(sale_date, self.average_price)
-            lookback_loss = max(0.0, purchase_price - avg_price)
-            recognized_loss = min(decline, actual_loss, lookback_loss)
-            
+        if code == RULE_C:
             return {
                 'recognized_loss': round(recognized_loss, 4),
-                'rule_applied': f'Rule (c): Sold during lookback period',
+                'rule_applied': _RULE_MSG_TWITTER[RuleCode.C],
                 'rule_code': 'C',
                 'details': {
                     'decline_amount': decline,
                     'actual_loss': actual_loss,
-                    'lookback_loss': lookback_loss,
+                    'lookback_loss': max(0.0, purchase_price - avg_price),
                     'avg_closing_price': avg_price
                 }
             }
         
         # After lookback period
-        recognized_loss = min(decline, actual_loss)
         return {
             'recognized_loss': round(recognized_loss, 4),
-            'rule_applied': f'Sold after lookback period',
+            'rule_applied': _RULE_MSG_TWITTER[RuleCode.POST_LOOKBACK],
             'rule_code': 'POST_LOOKBACK',
             'details': {
                 'decline_amount': decline,
@@ -465,51 +1067,53 @@ class SettlementCalculator:
             }
         }
     
-    def _calculate_kraft_heinz_loss(self, purchase_date: datetime, purchase_price: float,
-                                   sale_date: Optional[datetime], 
-                                   sale_price: Optional[float]) -> Dict[str, Any]:
-        """Calculate loss using Kraft Heinz settlement rules"""
-        
+    def _kraft_heinz_loss_inputs(self, purchase_date: datetime,
+                                 sale_date: Optional[datetime]) -> Tuple[float, float, float]:
+        """Purchase/sale inflation and average closing price for a Kraft Heinz match"""
         purchase_inflation = self._get_inflation_at_date(purchase_date, is_sale=False)
-        
-        # Shares held (not sold)
         if sale_date is None:
-            # Rule D: Held shares
-            held_loss = max(0.0, purchase_price - self.average_price)
-            recognized_loss = min(purchase_inflation, held_loss)
-            
+            return purchase_inflation, 0.0, self.average_price
+        return (purchase_inflation,
+                self._get_inflation_at_date(sale_date, is_sale=True),
+                self.avg_closing_prices.get(sale_date, self.average_price))
+    
+    def _explain_kraft_heinz_loss(self, code: int, recognized_loss: float,
+                                  purchase_date: datetime, purchase_price: float,
+                                  sale_date: Optional[datetime],
+                                  sale_price: Optional[float]) -> Dict[str, Any]:
+        """Result dict for a Kraft Heinz settlement match"""
+        purchase_inflation, sale_inflation, avg_price = \
+            self._kraft_heinz_loss_inputs(purchase_date, sale_date)
+        
+        if code == RULE_D:
             return {
                 'recognized_loss': round(recognized_loss, 4),
-                'rule_applied': f'Rule D: Held shares',
+                'rule_applied': _RULE_MSG_KRAFT_HEINZ[RuleCode.D],
                 'rule_code': 'D',
                 'details': {
                     'purchase_inflation': purchase_inflation,
-                    'held_loss': held_loss,
+                    'held_loss': max(0.0, purchase_price - self.average_price),
                     'average_price': self.average_price
                 }
             }
         
-        # Rule A: Sold before first corrective disclosure
-        if sale_date < self.corrective_dates[0]:
+        if code == RULE_A:
             return {
                 'recognized_loss': 0.0,
-                'rule_applied': 'Rule A: Sold before first corrective disclosure',
+                'rule_applied': _RULE_MSG_KRAFT_HEINZ[RuleCode.A],
                 'rule_code': 'A',
                 'details': {
                     'first_corrective_date': self.corrective_dates[0].isoformat()
                 }
             }
         
-        sale_inflation = self._get_inflation_at_date(sale_date, is_sale=True)
         inflation_decline = max(0.0, purchase_inflation - sale_inflation)
         actual_loss = max(0.0, purchase_price - sale_price)
         
-        # Rule B: Sold during class period
-        if sale_date <= self.class_end:
-            recognized_loss = min(inflation_decline, actual_loss)
+        if code == RULE_B:
             return {
                 'recognized_loss': round(recognized_loss, 4),
-                'rule_applied': f'Rule B: Sold during class period after corrective disclosure',
+                'rule_applied': _RULE_MSG_KRAFT_HEINZ[RuleCode.B],
                 'rule_code': 'B',
                 'details': {
                     'purchase_inflation': purchase_inflation,
@@ -519,31 +1123,25 @@ class SettlementCalculator:
                 }
             }
         
-        # Rule C: Sold during lookback period
-        if self.lookback_start <= sale_date <= self.lookback_end:
-            avg_price = self.avg_closing_prices.get(sale_date, self.average_price)
-            lookback_loss = max(0.0, purchase_price - avg_price)
-            recognized_loss = min(inflation_decline, actual_loss, lookback_loss)
-            
+        if code == RULE_C:
             return {
                 'recognized_loss': round(recognized_loss, 4),
-                'rule_applied': f'Rule C: Sold during lookback period',
+                'rule_applied': _RULE_MSG_KRAFT_HEINZ[RuleCode.C],
                 'rule_code': 'C',
                 'details': {
                     'purchase_inflation': purchase_inflation,
                     'sale_inflation': sale_inflation,
                     'inflation_decline': inflation_decline,
                     'actual_loss': actual_loss,
-                    'lookback_loss': lookback_loss,
+                    'lookback_loss': max(0.0, purchase_price - avg_price),
                     'avg_closing_price': avg_price
                 }
             }
         
         # After lookback period
-        recognized_loss = min(inflation_decline, actual_loss)
         return {
             'recognized_loss': round(recognized_loss, 4),
-            'rule_applied': f'Sold after lookback period',
+            'rule_applied': _RULE_MSG_KRAFT_HEINZ[RuleCode.POST_LOOKBACK],
             'rule_code': 'POST_LOOKBACK',
             'details': {
                 'purchase_inflation': purchase_inflation,
@@ -557,271 +1155,444 @@ class SettlementCalculator:
         """
         Load transactions from pandas DataFrame
         """
+        return self.load_transactions_from_chunks((df,))
+    
+    def load_transactions_from_chunks(self, chunks: Iterable[pd.DataFrame]) -> Dict[str, Any]:
+        """
+        Load transactions from a file read as a sequence of DataFrames (e.g.
+        read_csv with chunksize), so only one chunk of raw rows is held in
+        memory at a time
+        
+        Rows are identified by their index labels, which read_csv keeps
+        counting across chunks, so IDs and errors match a whole-file load.
+        """
         try:
-            # Normalize column names
-            df_copy = df.copy()
-            df_copy.columns = [col.strip().lower().replace(' ', '_') 
-                              for col in df_copy.columns]
-            
-            transactions_loaded = 0
+            transactions = []
             errors = []
-            self.transactions = []
+            total_rows = 0
+            n_chunks = 0
+            for df in chunks:
+                entity_categories, fund_categories = \
+                    self._load_transaction_rows(df, transactions, errors)
+                total_rows += len(df)
+                n_chunks += 1
             
-            for idx, row in df_copy.iterrows():
-                try:
-                    # Determine transaction type
-                    txn_type_str = str(row.get('transaction_type', 
-                                              row.get('type', ''))).strip().lower()
-                    
-                    # Default values
-                    quantity = 0.0
-                    price = 0.0
-                    date = None
-                    txn_type = None
-                    
-                    if 'beginning' in txn_type_str or 'holding' in txn_type_str or 'opening' in txn_type_str:
-                        # Beginning holdings
-                        quantity = float(row.get('holdings', 
-                                                row.get('quantity', 
-                                                       row.get('shares', 0))))
-                        if quantity <= 0:
-                            continue
-                        
-                        txn_type = TransactionType.BEGINNING_HOLDINGS
-                        price = 0.0
-                        # Set date to day before class period
-                        date = self.class_start - timedelta(days=1)
-                        
-                    elif 'purchase' in txn_type_str or 'buy' in txn_type_str:
-                        # Purchase
-                        quantity = float(row.get('purchases',
-                                                row.get('quantity',
-                                                       row.get('shares', 0))))
-                        if quantity <= 0:
-                            continue
-                        
-                        txn_type = TransactionType.PURCHASE
-                        price = float(row.get('price_per_share',
-                                             row.get('price',
-                                                    row.get('purchase_price', 0))))
-                        date = self._parse_date(row.get('trade_date',
-                                                       row.get('date',
-                                                              row.get('purchase_date'))))
-                        
-                    elif 'sale' in txn_type_str or 'sell' in txn_type_str:
-                        # Sale
-                        quantity = float(row.get('sales',
-                                                row.get('quantity',
-                                                       row.get('shares', 0))))
-                        if quantity <= 0:
-                            continue
-                        
-                        txn_type = TransactionType.SALE
-                        price = float(row.get('price_per_share',
-                                             row.get('price',
-                                                    row.get('sale_price', 0))))
-                        date = self._parse_date(row.get('trade_date',
-                                                       row.get('date',
-                                                              row.get('sale_date'))))
-                    else:
-                        # Try to infer from columns
-                        if 'purchases' in df_copy.columns and float(row.get('purchases', 0)) > 0:
-                            quantity = float(row['purchases'])
-                            txn_type = TransactionType.PURCHASE
-                            price = float(row.get('price_per_share', row.get('price', 0)))
-                            date = self._parse_date(row.get('trade_date', row.get('date')))
-                        elif 'sales' in df_copy.columns and float(row.get('sales', 0)) > 0:
-                            quantity = float(row['sales'])
-                            txn_type = TransactionType.SALE
-                            price = float(row.get('price_per_share', row.get('price', 0)))
-                            date = self._parse_date(row.get('trade_date', row.get('date')))
-                        elif 'holdings' in df_copy.columns and float(row.get('holdings', 0)) > 0:
-                            quantity = float(row['holdings'])
-                            txn_type = TransactionType.BEGINNING_HOLDINGS
-                            price = 0.0
-                            date = self.class_start - timedelta(days=1)
-                        else:
-                            continue
-                    
-                    if date is None:
-                        errors.append(f"Row {idx}: Invalid date")
-                        continue
-                    
-                    # Create transaction
-                    txn = Transaction(
-                        id=f"txn_{idx}_{transactions_loaded}",
-                        date=date,
-                        quantity=quantity,
-                        price=price,
-                        type=txn_type,
-                        entity=str(row.get('entity', row.get('fund_name', 'Unknown'))),
-                        fund_name=str(row.get('fund_name', row.get('entity', 'Unknown'))),
-                        comment=str(row.get('comment', row.get('notes', ''))),
-                        security_id=str(row.get('security_id', row.get('ticker', '')))
-                    )
-                    
-                    self.transactions.append(txn)
-                    transactions_loaded += 1
-                    
-                except Exception as e:
-                    errors.append(f"Row {idx}: {str(e)}")
-                    logger.warning(f"Error processing row {idx}: {str(e)}")
+            self.transactions = transactions
+            if n_chunks == 1:
+                self.entity_categories = entity_categories
+                self.fund_categories = fund_categories
+            else:
+                # Each chunk's codes index its own categories
+                self._rebuild_name_codes()
             
-            logger.info(f"Loaded {transactions_loaded} transactions with {len(errors)} errors")
+            logger.info("Loaded %d transactions with %d errors", len(transactions), len(errors))
             
             return {
                 'success': True,
-                'transactions_loaded': transactions_loaded,
-                'total_rows': len(df),
+                'transactions_loaded': len(transactions),
+                'total_rows': total_rows,
                 'errors': errors if errors else None,
                 'error_count': len(errors)
             }
             
         except Exception as e:
-            logger.error(f"Error loading DataFrame: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Error loading DataFrame: %s", e)
             return {
                 'success': False,
                 'error': str(e),
                 'transactions_loaded': 0
             }
     
+    def _load_transaction_rows(self, df: pd.DataFrame, transactions: List[Transaction],
+                               errors: List[str]) -> Tuple[pd.Index, pd.Index]:
+        """
+        Append the transactions parsed from df's rows to transactions (and
+        any row errors to errors)
+        
+        Returns the entity and fund categories indexed by the new
+        transactions' entity_code and fund_code.
+        """
+        # Normalize column names through a lookup table rather than
+        # copying the frame just to relabel it
+        col_map = {}
+        for col in df.columns:
+            col_map.setdefault(col.strip().lower().replace(' ', '_'), col)
+
+        n_rows = len(df)
+
+        def column_values(*names, default=None) -> np.ndarray:
+            """Values of the first alias column present, resolved once"""
+            for name in names:
+                if name in col_map:
+                    return df[col_map[name]].to_numpy(dtype=object)
+            return np.full(n_rows, default, dtype=object)
+
+        def numeric_values(*names, default=0) -> np.ndarray:
+            """Alias column as float64 when its dtype is numeric, else raw values"""
+            name = next((c for c in names if c in col_map), None)
+            if name is None:
+                return np.full(n_rows, default, dtype=np.float64)
+            column = df[col_map[name]]
+            if pd.api.types.is_numeric_dtype(column):
+                return column.to_numpy(dtype=np.float64)
+            # Mixed/text columns keep per-row float() so bad cells are reported per row
+            return column.to_numpy(dtype=object)
+
+        parsed_dates = {}
+
+        def date_values(*names) -> np.ndarray:
+            """Alias column parsed to datetimes (None when invalid), once per column"""
+            name = next((c for c in names if c in col_map), None)
+            if name not in parsed_dates:
+                parsed = self._parse_date_series(column_values(name))
+                dates = parsed.array.to_pydatetime().astype(object)
+                dates[parsed.isna().to_numpy()] = None
+                parsed_dates[name] = dates
+            return parsed_dates[name]
+
+        def text_values(*names, default: str) -> np.ndarray:
+            """Alias column values converted to str in a single pass"""
+            return pd.Series(column_values(*names, default=default)).astype(str).to_numpy()
+
+        # Extract every column the row loop needs once, instead of
+        # materializing a Series per row via iterrows()
+        row_labels = df.index.to_numpy()
+        type_str = pd.Series(column_values('transaction_type', 'type', default='')) \
+            .astype(str).str.lower()
+
+        # Classify every row's transaction type once (first matching
+        # TYPE_KEYWORDS entry wins)
+        kind_arr = np.select(
+            [type_str.str.contains('|'.join(keywords), regex=True).to_numpy()
+             for _, keywords in TYPE_KEYWORDS],
+            [kind for kind, _ in TYPE_KEYWORDS],
+            default=KIND_INFER
+        )
+
+        holdings_qty_arr = numeric_values('holdings', 'quantity', 'shares', default=0)
+        purchase_qty_arr = numeric_values('purchases', 'quantity', 'shares', default=0)
+        sale_qty_arr = numeric_values('sales', 'quantity', 'shares', default=0)
+        purchases_arr = numeric_values('purchases', default=0)
+        sales_arr = numeric_values('sales', default=0)
+        holdings_arr = numeric_values('holdings', default=0)
+
+        purchase_price_arr = numeric_values('price_per_share', 'price', 'purchase_price', default=0)
+        sale_price_arr = numeric_values('price_per_share', 'price', 'sale_price', default=0)
+        price_arr = numeric_values('price_per_share', 'price', default=0)
+
+        purchase_date_arr = date_values('trade_date', 'date', 'purchase_date')
+        sale_date_arr = date_values('trade_date', 'date', 'sale_date')
+        date_arr = date_values('trade_date', 'date')
+
+        # Dictionary-encode entity/fund names: transactions share one
+        # string object per distinct name and carry its integer code
+        entities = pd.Categorical(text_values('entity', 'fund_name', default='Unknown'))
+        funds = pd.Categorical(text_values('fund_name', 'entity', default='Unknown'))
+        entity_codes, fund_codes = entities.codes, funds.codes
+        entity_names = entities.categories.tolist()
+        fund_names = funds.categories.tolist()
+        comment_arr = text_values('comment', 'notes', default='')
+        security_arr = text_values('security_id', 'ticker', default='')
+
+        # The row loop reads plain lists (no NumPy scalar boxing per cell)
+        # and loop-invariant values bound once
+        kind_arr = kind_arr.tolist()
+        holdings_qty_arr, purchase_qty_arr, sale_qty_arr = \
+            holdings_qty_arr.tolist(), purchase_qty_arr.tolist(), sale_qty_arr.tolist()
+        purchases_arr, sales_arr, holdings_arr = \
+            purchases_arr.tolist(), sales_arr.tolist(), holdings_arr.tolist()
+        purchase_price_arr, sale_price_arr, price_arr = \
+            purchase_price_arr.tolist(), sale_price_arr.tolist(), price_arr.tolist()
+        purchase_date_arr, sale_date_arr, date_arr = \
+            purchase_date_arr.tolist(), sale_date_arr.tolist(), date_arr.tolist()
+        entity_codes, fund_codes = entity_codes.tolist(), fund_codes.tolist()
+        comment_arr, security_arr = comment_arr.tolist(), security_arr.tolist()
+        beginning_type = TransactionType.BEGINNING_HOLDINGS
+        purchase_type = TransactionType.PURCHASE
+        sale_type = TransactionType.SALE
+        # Beginning holdings are dated the day before the class period
+        beginning_date = self.class_start - timedelta(days=1)
+
+        for i in range(n_rows):
+            idx = row_labels[i]
+            try:
+                # Determine transaction type
+                kind = kind_arr[i]
+
+                # Default values
+                quantity = 0.0
+                price = 0.0
+                date = None
+                txn_type = None
+
+                if kind == KIND_BEGINNING:
+                    # Beginning holdings
+                    quantity = float(holdings_qty_arr[i])
+                    if quantity <= 0:
+                        continue
+
+                    txn_type = beginning_type
+                    price = 0.0
+                    date = beginning_date
+
+                elif kind == KIND_PURCHASE:
+                    # Purchase
+                    quantity = float(purchase_qty_arr[i])
+                    if quantity <= 0:
+                        continue
+
+                    txn_type = purchase_type
+                    price = float(purchase_price_arr[i])
+                    date = purchase_date_arr[i]
+
+                elif kind == KIND_SALE:
+                    # Sale
+                    quantity = float(sale_qty_arr[i])
+                    if quantity <= 0:
+                        continue
+
+                    txn_type = sale_type
+                    price = float(sale_price_arr[i])
+                    date = sale_date_arr[i]
+                else:
+                    # Try to infer from columns
+                    if float(purchases_arr[i]) > 0:
+                        quantity = float(purchases_arr[i])
+                        txn_type = purchase_type
+                        price = float(price_arr[i])
+                        date = date_arr[i]
+                    elif float(sales_arr[i]) > 0:
+                        quantity = float(sales_arr[i])
+                        txn_type = sale_type
+                        price = float(price_arr[i])
+                        date = date_arr[i]
+                    elif float(holdings_arr[i]) > 0:
+                        quantity = float(holdings_arr[i])
+                        txn_type = beginning_type
+                        price = 0.0
+                        date = beginning_date
+                    else:
+                        continue
+
+                if date is None:
+                    errors.append(f"Row {idx}: Invalid date")
+                    continue
+
+                # Create transaction
+                txn = Transaction(
+                    id=f"txn_{idx}_{len(transactions)}",
+                    date=date,
+                    quantity=quantity,
+                    price=price,
+                    type=txn_type,
+                    entity=entity_names[entity_codes[i]],
+                    fund_name=fund_names[fund_codes[i]],
+                    comment=comment_arr[i],
+                    security_id=security_arr[i],
+                    entity_code=entity_codes[i],
+                    fund_code=fund_codes[i]
+                )
+                
+                transactions.append(txn)
+                
+            except Exception as e:
+                errors.append(f"Row {idx}: {str(e)}")
+                logger.warning("Error processing row %s: %s", idx, e)
+        
+        return entities.categories, funds.categories
+    
+    @staticmethod
+    def _sorted_by_date(transactions: List[Transaction],
+                        tie_break_on_id: bool = False) -> List[Transaction]:
+        """Stable sort by date (then id) using NumPy's lexsort instead of key tuples"""
+        if len(transactions) < 2:
+            return list(transactions)
+        
+        dates = np.array([t.date for t in transactions], dtype='datetime64[us]')
+        if tie_break_on_id:
+            keys = (np.array([t.id for t in transactions]), dates)
+        else:
+            keys = (dates,)
+        return [transactions[i] for i in np.lexsort(keys)]
+    
     def _perform_fifo_matching(self, purchases: List[Transaction], 
                               sales: List[Transaction]) -> Tuple[List[MatchResult], List[Transaction]]:
         """Perform FIFO matching of purchases to sales"""
-        matches = []
-        inventory = []
-        
         # Separate beginning holdings and regular purchases
         beginning_holdings = [p for p in purchases if p.type == TransactionType.BEGINNING_HOLDINGS]
         regular_purchases = [p for p in purchases if p.type == TransactionType.PURCHASE]
         
-        # Sort by date (FIFO)
-        beginning_holdings.sort(key=lambda x: x.date)
-        regular_purchases.sort(key=lambda x: (x.date, x.id))
-        sales.sort(key=lambda x: (x.date, x.id))
+        # Initialize inventory with beginning holdings first, then regular
+        # purchases, each run sorted by date (FIFO) with a single lexsort:
+        # ties keep input order for holdings and fall back to id for purchases
+        n_beginning = len(beginning_holdings)
+        lots = TransactionArray.from_transactions(beginning_holdings + regular_purchases)
+        run = np.repeat(np.array([0, 1], dtype=np.int8), [n_beginning, len(regular_purchases)])
+        tie_break = np.arange(len(lots))
+        if regular_purchases:
+            tie_break[n_beginning:] = np.unique(np.array([p.id for p in regular_purchases]),
+                                                return_inverse=True)[1]
+        lots = lots.take(np.lexsort((tie_break, lots.dates, run)))
+        inventory = lots.transactions
+        
+        sales = self._sorted_by_date(sales, tie_break_on_id=True)
+        sale_lots = TransactionArray.from_transactions(sales)
+        
+        # Walk the inventory, then price every match in one batched pass
+        purchase_idx, sale_idx, match_qty = self._fifo_walk(lots, sale_lots, n_beginning)
+        lots.sync_remaining()
         
-        # Initialize inventory with beginning holdings first, then regular purchases
-        for bh in beginning_holdings:
-            bh.remaining_quantity = bh.quantity
-            inventory.append(bh)
+        matches = self._build_sale_matches(lots, sale_lots, purchase_idx, sale_idx, match_qty)
+        return matches, inventory
+    
+    def _fifo_walk(self, lots: TransactionArray, sale_lots: TransactionArray,
+                   n_beginning: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Consume inventory lots for each sale in FIFO order
+        
+        lots holds the beginning holdings (the first n_beginning lots) and
+        then the purchases, each run sorted by date. Runs fifo_match_kernel
+        (compiled when numba is installed) and updates lots.remaining in
+        place. Returns parallel arrays of (lot index, sale index, quantity)
+        per match.
+        """
+        lot_dates = lots.dates.view(np.int64)
+        sale_dates = sale_lots.dates.view(np.int64)
         
-        for purchase in regular_purchases:
-            purchase.remaining_quantity = purchase.quantity
-            inventory.append(purchase)
+        # Lots at or after these bounds (per run) are dated after the sale
+        beginning_bounds = np.searchsorted(lot_dates[:n_beginning], sale_dates, side='right')
+        sale_bounds = n_beginning + np.searchsorted(lot_dates[n_beginning:], sale_dates,
+                                                    side='right')
         
-        # Process each sale
-        for sale in sales:
-            remaining_sale_qty = sale.quantity
-            inventory_idx = 0
+        if NUMBA_AVAILABLE:
+            remaining = lots.remaining
+            sale_quantities = sale_lots.quantities
+        else:
+            # The interpreted kernel indexes plain lists much faster than arrays
+            beginning_bounds, sale_bounds = beginning_bounds.tolist(), sale_bounds.tolist()
+            remaining = lots.remaining.tolist()
+            sale_quantities = sale_lots.quantities.tolist()
+        
+        purchase_idx, sale_idx, match_qty, n_short = fifo_match_kernel(
+            remaining, sale_quantities, beginning_bounds, sale_bounds, n_beginning)
+        
+        if not NUMBA_AVAILABLE:
+            lots.remaining[:] = remaining
+        if n_short:
+            # Shouldn't happen with proper data
+            logger.warning("%d sales reached purchase lots dated after the sale", n_short)
+        
+        return purchase_idx, sale_idx, match_qty
+    
+    def _build_sale_matches(self, lots: TransactionArray, sale_lots: TransactionArray,
+                            purchase_idx: np.ndarray, sale_idx: np.ndarray,
+                            match_qty: np.ndarray) -> List[MatchResult]:
+        """Price FIFO matches in one batch and keep those with a recognized loss"""
+        # Beginning holdings are considered purchased at class start for price 0
+        beginning = lots.type_codes[purchase_idx] == KIND_BEGINNING
+        calc_dates = np.where(beginning, self.class_start_np, lots.dates[purchase_idx])
+        calc_prices = np.where(beginning, 0.0, lots.prices[purchase_idx])
+        
+        batch = self._calculate_losses_batch(calc_dates, calc_prices,
+                                             sale_lots.dates[sale_idx],
+                                             sale_lots.prices[sale_idx])
+        recognized_loss = batch['recognized_loss'] * match_qty
+        
+        # Keep only matches with a recognized loss: one mask over all rows
+        keep = recognized_loss > 0
+        recognized_loss, match_qty = recognized_loss[keep], match_qty[keep]
+        self._amount_parts.append((recognized_loss, match_qty))
+        rule_codes, rule_applied, details = self._explain_batch(batch, keep)
+        kept_rows = zip(purchase_idx[keep].tolist(), sale_idx[keep].tolist(),
+                        beginning[keep].tolist(), match_qty.tolist(), recognized_loss.tolist())
+        
+        # The number of kept matches is known up front, so fill by position
+        matches = [None] * len(recognized_loss)
+        for n, (lot, sale_row, is_beginning, quantity, loss) in enumerate(kept_rows):
+            purchase = lots.transactions[lot]
+            sale = sale_lots.transactions[sale_row]
+            if is_beginning:
+                calc_purchase_date, calc_purchase_price = self.class_start, 0.0
+            else:
+                calc_purchase_date, calc_purchase_price = purchase.date, purchase.price
             
-            while remaining_sale_qty > 0 and inventory_idx < len(inventory):
-                purchase = inventory[inventory_idx]
-                
-                if purchase.remaining_quantity <= 0:
-                    inventory_idx += 1
-                    continue
-                
-                # Skip if purchase date is after sale date (shouldn't happen with proper data)
-                if purchase.date > sale.date:
-                    logger.warning(f"Purchase date ({purchase.date}) after sale date ({sale.date})")
-                    inventory_idx += 1
-                    continue
-                
-                # Calculate match quantity
-                match_qty = min(remaining_sale_qty, purchase.remaining_quantity)
-                
-                # Determine purchase date and price for calculation
-                if purchase.type == TransactionType.BEGINNING_HOLDINGS:
-                    calc_purchase_date = self.class_start  # Beginning holdings considered purchased at class start
-                    calc_purchase_price = 0.0
-                else:
-                    calc_purchase_date = purchase.date
-                    calc_purchase_price = purchase.price
-                
-                # Calculate recognized loss
-                result = self.calculate_recognized_loss_per_share(
-                    calc_purchase_date, calc_purchase_price,
-                    sale.date, sale.price
-                )
-                
-                recognized_loss = result['recognized_loss'] * match_qty
-                
-                # Create match result
-                match = MatchResult(
-                    match_id=f"{purchase.id}_{sale.id}_{len(matches)}",
-                    purchase_id=purchase.id,
-                    sale_id=sale.id,
-                    quantity=match_qty,
-                    recognized_loss=recognized_loss,
-                    rule_applied=result['rule_applied'],
-                    rule_code=result['rule_code'],
-                    purchase_date=calc_purchase_date,
-                    sale_date=sale.date,
-                    purchase_price=calc_purchase_price,
-                    sale_price=sale.price,
-                    entity=purchase.entity,
-                    fund_name=purchase.fund_name,
-                    details=result['details']
-                )
-                
-                if recognized_loss > 0:
-                    matches.append(match)
-                
-                # Update inventory
-                purchase.remaining_quantity -= match_qty
-                remaining_sale_qty -= match_qty
-                
-                # Move to next purchase if current one is depleted
-                if purchase.remaining_quantity <= 0:
-                    inventory_idx += 1
+            matches[n] = MatchResult(
+                purchase_id=purchase.id,
+                sale_id=sale.id,
+                quantity=quantity,
+                recognized_loss=loss,
+                rule_applied=rule_applied[n],
+                rule_code=rule_codes[n],
+                purchase_date=calc_purchase_date,
+                sale_date=sale.date,
+                purchase_price=calc_purchase_price,
+                sale_price=sale.price,
+                entity=purchase.entity,
+                fund_name=purchase.fund_name,
+                details=details[n],
+                entity_code=purchase.entity_code,
+                fund_code=purchase.fund_code,
+                match_seq=n
+            )
         
-        return matches, inventory
+        return matches
     
     def _calculate_held_losses(self) -> List[MatchResult]:
         """Calculate losses for shares held (not sold)"""
-        held_losses = []
-        
-        for purchase in self.inventory:
-            if purchase.remaining_quantity > 0:
-                # Determine purchase date and price for calculation
-                if purchase.type == TransactionType.BEGINNING_HOLDINGS:
-                    calc_purchase_date = self.class_start
-                    calc_purchase_price = 0.0
-                else:
-                    calc_purchase_date = purchase.date
-                    calc_purchase_price = purchase.price
-                
-                # Skip if purchase is not in class period
-                if purchase.type == TransactionType.PURCHASE:
-                    if calc_purchase_date < self.class_start or calc_purchase_date > self.class_end:
-                        continue
-                
-                # Calculate recognized loss for held shares
-                result = self.calculate_recognized_loss_per_share(
-                    calc_purchase_date, calc_purchase_price,
-                    None, None  # No sale
-                )
-                
-                recognized_loss = result['recognized_loss'] * purchase.remaining_quantity
-                
-                if recognized_loss > 0:
-                    match = MatchResult(
-                        match_id=f"{purchase.id}_held_{len(held_losses)}",
-                        purchase_id=purchase.id,
-                        sale_id=None,
-                        quantity=purchase.remaining_quantity,
-                        recognized_loss=recognized_loss,
-                        rule_applied=result['rule_applied'],
-                        rule_code=result['rule_code'],
-                        purchase_date=calc_purchase_date,
-                        sale_date=None,
-                        purchase_price=calc_purchase_price,
-                        sale_price=None,
-                        entity=purchase.entity,
-                        fund_name=purchase.fund_name,
-                        details=result['details']
-                    )
-                    held_losses.append(match)
+        if not self.inventory:
+            self._amount_parts.append((np.empty(0), np.empty(0)))
+            return []
+        
+        lots = TransactionArray.from_transactions(self.inventory)
+        remaining = np.array([t.remaining_quantity for t in self.inventory], dtype=np.float64)
+        
+        # Beginning holdings are considered purchased at class start for price 0
+        beginning = lots.type_codes == KIND_BEGINNING
+        calc_dates = np.where(beginning, self.class_start_np, lots.dates)
+        calc_prices = np.where(beginning, 0.0, lots.prices)
+        
+        # Skip purchases that are not in the class period
+        outside = (lots.type_codes == KIND_PURCHASE) & (
+            (calc_dates < self.class_start_np) | (calc_dates > self.class_end_np))
+        rows = np.flatnonzero((remaining > 0) & ~outside)
+        
+        # Calculate recognized loss for all held lots at once (no sale)
+        batch = self._calculate_held_batch(calc_dates[rows], calc_prices[rows])
+        recognized_loss = batch['recognized_loss'] * remaining[rows]
+        
+        # Keep only lots with a recognized loss: one mask over all rows
+        keep = recognized_loss > 0
+        recognized_loss, rows = recognized_loss[keep], rows[keep]
+        self._amount_parts.append((recognized_loss, remaining[rows]))
+        rule_codes, rule_applied, details = self._explain_batch(batch, keep)
+        kept_rows = zip(rows.tolist(), beginning[rows].tolist(), recognized_loss.tolist())
+        
+        held_losses = [None] * len(rows)
+        for n, (row, is_beginning, loss) in enumerate(kept_rows):
+            purchase = self.inventory[row]
+            if is_beginning:
+                calc_purchase_date, calc_purchase_price = self.class_start, 0.0
+            else:
+                calc_purchase_date, calc_purchase_price = purchase.date, purchase.price
+            
+            held_losses[n] = MatchResult(
+                purchase_id=purchase.id,
+                sale_id=None,
+                quantity=purchase.remaining_quantity,
+                recognized_loss=loss,
+                rule_applied=rule_applied[n],
+                rule_code=rule_codes[n],
+                purchase_date=calc_purchase_date,
+                sale_date=None,
+                purchase_price=calc_purchase_price,
+                sale_price=None,
+                entity=purchase.entity,
+                fund_name=purchase.fund_name,
+                details=details[n],
+                entity_code=purchase.entity_code,
+                fund_code=purchase.fund_code,
+                match_seq=n
+            )
         
         return held_losses
     
@@ -833,6 +1604,10 @@ class SettlementCalculator:
             # Reset previous calculations
             self.matches = []
             self.inventory = []
+            self._amount_parts = []
+            self._matches_version += 1
+            
+            self._encode_names()
             
             # Separate transactions by type
             purchases = [t for t in self.transactions 
@@ -856,16 +1631,25 @@ class SettlementCalculator:
             # Calculate held shares losses
             held_losses = self._calculate_held_losses()
             self.matches.extend(held_losses)
+            self._matches_version += 1
             
-            # Calculate summary
-            total_loss = sum(m.recognized_loss for m in self.matches)
-            total_quantity = sum(m.quantity for m in self.matches)
+            # Calculate summary from the amount arrays the matching produced
+            self._check_results_cache()
+            self._match_amounts_cache = (
+                np.concatenate([losses for losses, _ in self._amount_parts]),
+                np.concatenate([quantities for _, quantities in self._amount_parts]),
+            )
+            losses, quantities = self._match_amounts()
+            total_loss = float(losses.sum())
+            total_quantity = float(quantities.sum())
             
             # Group by entity and fund
             entity_summary = self._calculate_entity_summary()
             fund_summary = self._calculate_fund_summary()
             
-            logger.info(f"Calculated {len(self.matches)} matches with total loss ${total_loss:,.2f}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Calculated %d matches with total loss $%s",
+                            len(self.matches), f"{total_loss:,.2f}")
             
             return {
                 'success': True,
@@ -879,110 +1663,264 @@ class SettlementCalculator:
             }
             
         except Exception as e:
-            logger.error(f"Error calculating losses: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Error calculating losses: %s", e)
             return {
                 'success': False,
                 'error': str(e),
                 'settlement_type': self.settlement_type.value
             }
     
-    def _calculate_entity_summary(self) -> Dict[str, Any]:
-        """Calculate summary by entity"""
-        entity_summary = defaultdict(lambda: {
-            'total_loss': 0.0,
-            'total_quantity': 0.0,
-            'funds': set(),
-            'match_count': 0,
-            'rules': defaultdict(float)
-        })
-        
-        for match in self.matches:
-            entity_info = entity_summary[match.entity]
-            entity_info['total_loss'] += match.recognized_loss
-            entity_info['total_quantity'] += match.quantity
-            entity_info['funds'].add(match.fund_name)
-            entity_info['match_count'] += 1
-            entity_info['rules'][match.rule_code] += match.recognized_loss
-        
-        # Convert to serializable format
-        result = {}
-        for entity, info in entity_summary.items():
-            result[entity] = {
-                'total_recognized_loss': round(info['total_loss'], 2),
-                'total_quantity': round(info['total_quantity'], 2),
-                'fund_count': len(info['funds']),
-                'funds': sorted(list(info['funds'])),
-                'match_count': info['match_count'],
-                'rules': {k: round(v, 2) for k, v in info['rules'].items()}
-            }
+    def _encode_names(self):
+        """
+        Make sure every transaction carries entity/fund codes
         
-        return result
+        The loader assigns them; transactions added any other way get the
+        category indexes rebuilt from all current transactions.
+        """
+        if all(t.entity_code >= 0 and t.fund_code >= 0 for t in self.transactions):
+            return
+        self._rebuild_name_codes()
+    
+    def _rebuild_name_codes(self):
+        """Rebuild the entity/fund category indexes and codes from all transactions"""
+        entities = pd.Categorical([t.entity for t in self.transactions])
+        funds = pd.Categorical([t.fund_name for t in self.transactions])
+        self.entity_categories = entities.categories
+        self.fund_categories = funds.categories
+        for txn, entity_code, fund_code in zip(self.transactions, entities.codes.tolist(),
+                                               funds.codes.tolist()):
+            txn.entity_code = entity_code
+            txn.fund_code = fund_code
+    
+    def _check_results_cache(self):
+        """Drop cached results if self.matches was recalculated or replaced/resized"""
+        key = (self._matches_version, id(self.matches), len(self.matches))
+        if key != self._results_cache_key:
+            self._results_cache_key = key
+            self._matches_df = None
+            self._entity_summary = None
+            self._fund_summary = None
+            self._match_amounts_cache = None
+    
+    def _match_amounts(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Unrounded recognized loss and quantity arrays of self.matches, cached"""
+        self._check_results_cache()
+        if self._match_amounts_cache is None:
+            n = len(self.matches)
+            self._match_amounts_cache = (
+                np.fromiter((m.recognized_loss for m in self.matches), dtype=np.float64, count=n),
+                np.fromiter((m.quantity for m in self.matches), dtype=np.float64, count=n),
+            )
+        return self._match_amounts_cache
+    
+    def _calculate_entity_summary(self) -> Dict[str, Any]:
+        """Summary by entity, cached until the matches change"""
+        return self._calculate_summaries()[0]
     
     def _calculate_fund_summary(self) -> Dict[str, Any]:
-        """Calculate summary by fund"""
-        fund_summary = defaultdict(lambda: {
-            'total_loss': 0.0,
-            'total_quantity': 0.0,
-            'entities': set(),
-            'match_count': 0,
-            'rules': defaultdict(float)
+        """Summary by fund, cached until the matches change"""
+        return self._calculate_summaries()[1]
+    
+    def _calculate_summaries(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Entity and fund summaries from a single aggregation pass, cached"""
+        self._check_results_cache()
+        if self._entity_summary is None or self._fund_summary is None:
+            cells = self._summary_cells()
+            self._entity_summary = self._summarize_cells(
+                cells, 'entity_code', self.entity_categories,
+                'fund_code', self.fund_categories, 'fund_count', 'funds')
+            self._fund_summary = self._summarize_cells(
+                cells, 'fund_code', self.fund_categories,
+                'entity_code', self.entity_categories, 'entity_count', 'entities')
+        return self._entity_summary, self._fund_summary
+    
+    def _summary_cells(self) -> pd.DataFrame:
+        """
+        Loss, quantity and match count per (entity, fund, rule) cell
+        
+        Built from the unrounded match amounts (the matches DataFrame rounds
+        losses for display). Both summaries are rolled up from these cells,
+        so the matches are only traversed once. Cells keep first-seen order.
+        """
+        matches = self.matches
+        df = pd.DataFrame({
+            'entity_code': np.array([m.entity_code for m in matches], dtype=np.int32),
+            'fund_code': np.array([m.fund_code for m in matches], dtype=np.int32),
+            'rule_code': [m.rule_code for m in matches],
+            'recognized_loss': np.array([m.recognized_loss for m in matches], dtype=np.float64),
+            'quantity': np.array([m.quantity for m in matches], dtype=np.float64),
         })
+        return df.groupby(['entity_code', 'fund_code', 'rule_code'], sort=False).agg(
+            loss=('recognized_loss', 'sum'),
+            quantity=('quantity', 'sum'),
+            match_count=('recognized_loss', 'size'),
+        ).reset_index()
+    
+    @staticmethod
+    def _summarize_cells(cells: pd.DataFrame, key: str, names: pd.Index,
+                         member_key: str, member_names: pd.Index,
+                         count_label: str, members_label: str) -> Dict[str, Any]:
+        """
+        Totals, distinct members and per-rule losses for each value of key
+        
+        Grouping runs on the integer entity/fund codes; names (and
+        member_names) map the codes back to strings for the result.
+        """
+        if cells.empty:
+            return {}
         
-        for match in self.matches:
-            fund_info = fund_summary[match.fund_name]
-            fund_info['total_loss'] += match.recognized_loss
-            fund_info['total_quantity'] += match.quantity
-            fund_info['entities'].add(match.entity)
-            fund_info['match_count'] += 1
-            fund_info['rules'][match.rule_code] += match.recognized_loss
+        # sort=False keeps groups (and rules within them) in first-seen order
+        grouped = cells.groupby(key, sort=False)
+        totals = grouped[['loss', 'quantity', 'match_count']].sum()
+        members = grouped[member_key].unique()
+        
+        rules = defaultdict(dict)
+        rule_losses = cells.groupby([key, 'rule_code'], sort=False)['loss'].sum()
+        for (group, rule_code), loss in rule_losses.items():
+            rules[group][rule_code] = round(loss, 2)
         
         # Convert to serializable format
         result = {}
-        for fund, info in fund_summary.items():
-            result[fund] = {
-                'total_recognized_loss': round(info['total_loss'], 2),
-                'total_quantity': round(info['total_quantity'], 2),
-                'entity_count': len(info['entities']),
-                'entities': sorted(list(info['entities'])),
-                'match_count': info['match_count'],
-                'rules': {k: round(v, 2) for k, v in info['rules'].items()}
+        for group, total_loss, total_quantity, match_count in zip(
+                totals.index.tolist(), totals['loss'].tolist(),
+                totals['quantity'].tolist(), totals['match_count'].tolist()):
+            member_list = sorted(member_names[members[group]].tolist())
+            result[names[group]] = {
+                'total_recognized_loss': round(total_loss, 2),
+                'total_quantity': round(total_quantity, 2),
+                count_label: len(member_list),
+                members_label: member_list,
+                'match_count': match_count,
+                'rules': rules[group]
             }
         
         return result
     
     def get_matches_dataframe(self) -> pd.DataFrame:
-        """Get matches as pandas DataFrame"""
+        """
+        Get matches as pandas DataFrame
+        
+        The frame is cached until the matches change and shared between
+        callers, so treat it as read-only.
+        """
+        self._check_results_cache()
+        if self._matches_df is None:
+            self._matches_df = self._build_matches_dataframe()
+        return self._matches_df
+    
+    def _build_matches_dataframe(self) -> pd.DataFrame:
+        """Build the matches DataFrame"""
         if not self.matches:
             return pd.DataFrame()
         
-        data = []
-        for match in self.matches:
-            row = {
-                'match_id': match.match_id,
-                'purchase_id': match.purchase_id,
-                'sale_id': match.sale_id,
-                'quantity': match.quantity,
-                'recognized_loss': round(match.recognized_loss, 4),
-                'loss_per_share': round(match.recognized_loss / match.quantity, 4) if match.quantity > 0 else 0,
-                'rule_applied': match.rule_applied,
-                'rule_code': match.rule_code,
-                'purchase_date': match.purchase_date,
-                'sale_date': match.sale_date,
-                'purchase_price': match.purchase_price,
-                'sale_price': match.sale_price,
-                'entity': match.entity,
-                'fund_name': match.fund_name,
-                'details': json.dumps(match.details, default=str)
-            }
-            data.append(row)
+        # Gather every column in one pass and hand pandas a dict of columns
+        n = len(self.matches)
+        match_ids, purchase_ids, sale_ids = [None] * n, [None] * n, [None] * n
+        rules_applied, rule_codes = [None] * n, [None] * n
+        purchase_dates, sale_dates = [None] * n, [None] * n
+        entities, fund_names, details = [None] * n, [None] * n, [None] * n
+        sale_prices = [None] * n  # None for held shares, inferred like the dates
+        quantities = np.empty(n, dtype=np.float64)
+        losses = np.empty(n, dtype=np.float64)
+        purchase_prices = np.empty(n, dtype=np.float64)
+        
+        for i, match in enumerate(self.matches):
+            match_ids[i] = match.match_id
+            purchase_ids[i] = match.purchase_id
+            sale_ids[i] = match.sale_id
+            quantities[i] = match.quantity
+            losses[i] = match.recognized_loss
+            rules_applied[i] = match.rule_applied
+            rule_codes[i] = match.rule_code
+            purchase_dates[i] = match.purchase_date
+            sale_dates[i] = match.sale_date
+            purchase_prices[i] = match.purchase_price
+            sale_prices[i] = match.sale_price
+            entities[i] = match.entity
+            fund_names[i] = match.fund_name
+            details[i] = json.dumps(match.details, default=str)
         
-        df = pd.DataFrame(data)
+        rounded_losses, rounded_per_share = self._rounded_losses(losses, quantities)
+        
+        df = pd.DataFrame({
+            'match_id': match_ids,
+            'purchase_id': purchase_ids,
+            'sale_id': sale_ids,
+            'quantity': quantities,
+            'recognized_loss': rounded_losses,
+            'loss_per_share': rounded_per_share,
+            # Low-cardinality text columns are stored dictionary-encoded
+            'rule_applied': pd.Categorical(rules_applied),
+            'rule_code': pd.Categorical(rule_codes),
+            'purchase_date': purchase_dates,
+            'sale_date': sale_dates,
+            'purchase_price': purchase_prices,
+            'sale_price': sale_prices,
+            'entity': pd.Categorical(entities),
+            'fund_name': pd.Categorical(fund_names),
+            'details': details
+        })
+        if PYARROW_AVAILABLE:
+            # Unique (never missing) text held in one Arrow buffer per column
+            # rather than a Python object per cell
+            df = df.astype({column: 'string[pyarrow]'
+                            for column in ('match_id', 'purchase_id', 'details')})
         return df
     
+    @staticmethod
+    def _rounded_losses(losses: np.ndarray,
+                        quantities: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Display-rounded loss and loss per share columns"""
+        # Losses are kept unrounded while matching and rounded here in one pass
+        loss_per_share = np.divide(losses, quantities, out=np.zeros_like(losses),
+                                   where=quantities > 0)
+        return np.round(losses, 4), np.round(loss_per_share, 4)
+    
+    @staticmethod
+    def _csv_date_format(dates: List[Optional[datetime]]) -> str:
+        """strftime format pandas' to_csv would pick for a column of datetimes"""
+        present = [d for d in dates if d is not None]
+        if any(d.microsecond for d in present):
+            return '%Y-%m-%d %H:%M:%S.%f'
+        if any(d.hour or d.minute or d.second for d in present):
+            return '%Y-%m-%d %H:%M:%S'
+        return '%Y-%m-%d'
+    
+    def _write_matches_csv(self, stream):
+        """Write the matches as CSV rows straight from self.matches"""
+        matches = self.matches
+        losses, per_share = self._rounded_losses(
+            np.array([m.recognized_loss for m in matches], dtype=np.float64),
+            np.array([m.quantity for m in matches], dtype=np.float64))
+        purchase_format = self._csv_date_format([m.purchase_date for m in matches])
+        sale_format = self._csv_date_format([m.sale_date for m in matches])
+        
+        def number(value):
+            return '' if value is None or value != value else value
+        
+        writer = csv.writer(stream, lineterminator='\n')
+        writer.writerow(MATCH_COLUMNS)
+        for match, loss, loss_per_share in zip(matches, losses.tolist(), per_share.tolist()):
+            writer.writerow((
+                match.match_id,
+                match.purchase_id,
+                match.sale_id,
+                number(match.quantity),
+                number(loss),
+                number(loss_per_share),
+                match.rule_applied,
+                match.rule_code,
+                match.purchase_date.strftime(purchase_format),
+                '' if match.sale_date is None else match.sale_date.strftime(sale_format),
+                number(match.purchase_price),
+                number(match.sale_price),
+                match.entity,
+                match.fund_name,
+                json.dumps(match.details, default=str)
+            ))
+    
     def get_summary_report(self) -> Dict[str, Any]:
         """Get comprehensive summary report"""
-        df_matches = self.get_matches_dataframe()
-        
         report = {
             'settlement_type': self.settlement_type.value,
             'calculation_date': datetime.now().isoformat(),
@@ -995,43 +1933,45 @@ class SettlementCalculator:
             'by_fund': {}
         }
         
-        if not df_matches.empty:
-            # Basic totals
-            report['total_recognized_loss'] = round(df_matches['recognized_loss'].sum(), 2)
-            report['total_quantity'] = round(df_matches['quantity'].sum(), 2)
-            report['matches_count'] = len(df_matches)
+        if self.matches:
+            # Basic totals (over the display-rounded losses, as in the matches frame)
+            losses, quantities = self._match_amounts()
+            rounded_losses, _ = self._rounded_losses(losses, quantities)
+            report['total_recognized_loss'] = round(float(rounded_losses.sum()), 2)
+            report['total_quantity'] = round(float(quantities.sum()), 2)
+            report['matches_count'] = len(self.matches)
+            
+            # Only the grouped columns are gathered; the full matches
+            # DataFrame (ids, prices, details JSON) is not needed here
+            matches = self.matches
+            purchase_dates = np.array([m.purchase_date for m in matches], dtype='datetime64[us]')
+            df_matches = pd.DataFrame({
+                'recognized_loss': rounded_losses,
+                'quantity': quantities,
+                'rule_code': pd.Categorical([m.rule_code for m in matches]),
+                # 'YYYY-MM' keys straight from NumPy's month unit
+                'purchase_month': purchase_dates.astype('datetime64[M]').astype(str),
+                'entity': pd.Categorical([m.entity for m in matches]),
+                'fund_name': pd.Categorical([m.fund_name for m in matches]),
+            })
+            sums = {'recognized_loss': ('recognized_loss', 'sum'), 'quantity': ('quantity', 'sum')}
+            counted = {**sums, 'match_id': ('recognized_loss', 'count')}
             
             # By rule
-            rule_summary = df_matches.groupby('rule_code').agg({
-                'recognized_loss': 'sum',
-                'quantity': 'sum',
-                'match_id': 'count'
-            }).reset_index()
-            report['by_rule'] = rule_summary.to_dict('records')
+            rule_summary = df_matches.groupby('rule_code', observed=True).agg(**counted)
+            report['by_rule'] = rule_summary.reset_index().to_dict('records')
             
             # By month (for purchases)
-            df_matches['purchase_month'] = df_matches['purchase_date'].dt.to_period('M').astype(str)
-            month_summary = df_matches.groupby('purchase_month').agg({
-                'recognized_loss': 'sum',
-                'quantity': 'sum'
-            }).reset_index()
-            report['by_month'] = month_summary.to_dict('records')
+            month_summary = df_matches.groupby('purchase_month').agg(**sums)
+            report['by_month'] = month_summary.reset_index().to_dict('records')
             
             # By entity
-            entity_summary = df_matches.groupby('entity').agg({
-                'recognized_loss': 'sum',
-                'quantity': 'sum',
-                'match_id': 'count'
-            }).reset_index()
-            report['by_entity'] = entity_summary.to_dict('records')
+            entity_summary = df_matches.groupby('entity', observed=True).agg(**counted)
+            report['by_entity'] = entity_summary.reset_index().to_dict('records')
             
             # By fund
-            fund_summary = df_matches.groupby('fund_name').agg({
-                'recognized_loss': 'sum',
-                'quantity': 'sum',
-                'match_id': 'count'
-            }).reset_index()
-            report['by_fund'] = fund_summary.to_dict('records')
+            fund_summary = df_matches.groupby('fund_name', observed=True).agg(**counted)
+            report['by_fund'] = fund_summary.reset_index().to_dict('records')
         
         return report
     
@@ -1046,20 +1986,22 @@ class SettlementCalculator:
         Returns:
             File content or path
         """
-        df_matches = self.get_matches_dataframe()
-        
-        if df_matches.empty:
+        if not self.matches:
             return "No results to export"
         
         if format.lower() == 'csv':
-            output = df_matches.to_csv(index=False)
+            # Rows are written straight from the matches; no DataFrame needed
             if filename:
                 with open(filename, 'w', newline='') as f:
-                    f.write(output)
+                    self._write_matches_csv(f)
                 return filename
-            return output
+            output = StringIO()
+            self._write_matches_csv(output)
+            return output.getvalue()
         
         elif format.lower() == 'excel':
+            df_matches = self.get_matches_dataframe()
+
             if not filename:
                 filename = f'settlement_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
             
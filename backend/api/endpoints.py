@@ -1,26 +1,182 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, Body, File, UploadFile
 from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from typing import List, Optional, Dict, Any
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import io
+import asyncio
+import itertools
+import secrets
 import json
 import logging
 import traceback
 import uuid
 import tempfile
+import time
+import shutil
 import os
+import atexit
+from pathlib import PurePath
+from collections import OrderedDict
+from functools import lru_cache
 
 from api.calculator import SettlementCalculator, SettlementType, Transaction, TransactionType
 
+# Optional faster parsers: pandas' multithreaded pyarrow CSV engine (which
+# also enables Parquet/Feather uploads) and the calamine Excel reader
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    PYARROW_AVAILABLE = False
+    CSV_ENGINE = 'c'
 
-calculations_store = {}
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = None  # pandas default (openpyxl/xlrd)
+
+
+def _read_csv(source) -> pd.DataFrame:
+    return pd.read_csv(source, engine=CSV_ENGINE)
+
+
+def _read_excel(source) -> pd.DataFrame:
+    return pd.read_excel(source, engine=EXCEL_ENGINE)
+
+
+# Transaction file readers by (lowercase) extension
+TRANSACTION_FILE_READERS = {'.csv': _read_csv, '.xlsx': _read_excel, '.xls': _read_excel}
+SUPPORTED_FORMATS = ['CSV (.csv)', 'Excel (.xlsx, .xls)']
+if PYARROW_AVAILABLE:
+    TRANSACTION_FILE_READERS.update({'.parquet': pd.read_parquet, '.feather': pd.read_feather})
+    SUPPORTED_FORMATS += ['Parquet (.parquet)', 'Feather (.feather)']
+UNSUPPORTED_FORMAT_MESSAGE = (
+    f"Unsupported file format. Please upload {', '.join(SUPPORTED_FORMATS[:-1])} "
+    f"or {SUPPORTED_FORMATS[-1]} files only."
+)
+
+
+def file_extension(filename: str) -> str:
+    """Lowercase extension of a file name, including the dot"""
+    return PurePath(filename).suffix.lower()
+
+
+class CalculationStore:
+    """
+    Bounded LRU store for uploads and calculation results
+    
+    Holds at most maxsize entries and drops the least recently used one
+    when full. A 'matches_df' in a stored entry is pickled to a spill
+    directory and replaced by its 'matches_path'; read it back with
+    load_matches(). Entries live in this process only.
+    """
+    
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._spill_dir = None
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+    
+    def get(self, key: str, default=None):
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+    
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+    
+    def __setitem__(self, key: str, entry: Dict[str, Any]):
+        if key in self._entries:
+            self._discard(self._entries.pop(key))
+        
+        matches_df = entry.pop('matches_df', None)
+        if matches_df is not None:
+            entry['matches_path'] = self._spill(matches_df)
+        
+        self._entries[key] = entry
+        while len(self._entries) > self.maxsize:
+            _, evicted = self._entries.popitem(last=False)
+            self._discard(evicted)
+    
+    def load_matches(self, entry: Dict[str, Any]) -> pd.DataFrame:
+        """Matches DataFrame of a stored calculation"""
+        return pd.read_pickle(entry['matches_path'])
+    
+    def _spill(self, matches_df: pd.DataFrame) -> str:
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='settlement_results_')
+            atexit.register(shutil.rmtree, self._spill_dir, ignore_errors=True)
+        path = os.path.join(self._spill_dir, f"{uuid.uuid4().hex}.pkl")
+        matches_df.to_pickle(path)
+        return path
+    
+    @staticmethod
+    def _discard(entry: Dict[str, Any]):
+        path = entry.get('matches_path')
+        if path and os.path.exists(path):
+            os.unlink(path)
+
+
+calculations_store = CalculationStore(maxsize=256)
+
+# Rows formatted per chunk when streaming downloads
+DOWNLOAD_CHUNK_ROWS = 10_000
+
+# CSV uploads larger than this are parsed and loaded UPLOAD_CHUNK_ROWS rows
+# at a time instead of as one DataFrame
+UPLOAD_CHUNK_THRESHOLD_BYTES = 64 * 1024 * 1024
+UPLOAD_CHUNK_ROWS = 50_000
+
+# Per-process sequence for calculation IDs; the random suffix keeps IDs
+# unique across workers and restarts
+_id_counter = itertools.count()
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def new_calculation_id(prefix: str) -> str:
+    """Unique ID for a stored upload or calculation"""
+    return f"{prefix}_{next(_id_counter)}_{secrets.token_hex(4)}"
+
+
+@lru_cache(maxsize=4)
+def _get_readonly_calculator(settlement_type: str) -> SettlementCalculator:
+    """
+    Shared calculator per settlement type for single calculations
+
+    calculate_recognized_loss_per_share only reads the settlement
+    configuration, so one instance can serve every request. Never load
+    transactions into it (uploads create their own calculators).
+    """
+    return SettlementCalculator(settlement_type)
+
+
+def _parse_date(value: str) -> datetime:
+    """Parse a request date: ISO 8601 fast path, pandas for anything else"""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        timestamp = pd.Timestamp(value)
+        if timestamp is pd.NaT:
+            raise ValueError(f"Invalid date: {value}")
+        return timestamp.to_pydatetime()
+
+
 @router.post("/calculate/single")
 async def calculate_single_loss(
     settlement_type: SettlementType = Body(..., description="Settlement type"),
@@ -35,26 +191,24 @@ async def calculate_single_loss(
     try:
         logger.info(f"Single calculation for {settlement_type.value}")
         
-        # Create calculator
-        calculator = SettlementCalculator(settlement_type.value)
+        # Settlement configuration is read-only here, so reuse a calculator
+        calculator = _get_readonly_calculator(settlement_type.value)
         
         # Parse dates
-        from dateutil import parser
-        
         try:
-            purchase_date_obj = parser.parse(purchase_date)
+            purchase_date_obj = _parse_date(purchase_date)
         except:
             raise HTTPException(status_code=400, detail=f"Invalid purchase date format: {purchase_date}")
         
         sale_date_obj = None
         if sale_date:
             try:
-                sale_date_obj = parser.parse(sale_date)
+                sale_date_obj = _parse_date(sale_date)
             except:
                 raise HTTPException(status_code=400, detail=f"Invalid sale date format: {sale_date}")
         
         # Calculate loss per share
-        start_time = datetime.now()
+        start_time = time.perf_counter_ns()
         
         # For beginning holdings, use class start date and zero price
         if is_beginning_holdings:
@@ -71,12 +225,13 @@ async def calculate_single_loss(
             sale_price=sale_price
         )
         
-        processing_time = (datetime.now() - start_time).total_seconds() * 1000
+        processing_time = (time.perf_counter_ns() - start_time) / 1e6
         
         # Calculate total loss
         total_loss = result['recognized_loss'] * quantity
         
-        calculation_id = f"single_{datetime.now().timestamp()}_{uuid.uuid4().hex[:8]}"
+        calculation_id = new_calculation_id("single")
+        timestamp = datetime.now().isoformat()
         calculations_store[calculation_id] = {
             "type": "single",
             "result": result,
@@ -89,12 +244,12 @@ async def calculate_single_loss(
                 "quantity": quantity,
                 "is_beginning_holdings": is_beginning_holdings
             },
-            "timestamp": datetime.now().isoformat()
+            "timestamp": timestamp
         }
         
         return {
             "calculation_id": calculation_id,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": timestamp,
             "settlement_type": settlement_type.value,
             "input": {
                 "purchase_date": purchase_date,
@@ -130,30 +285,13 @@ async def upload_transactions(
         logger.info(f"Uploading file {file.filename} for {settlement_type}")
         
         # Validate file extension
-        file_ext = file.filename.lower()
-        if not (file_ext.endswith('.csv') or file_ext.endswith('.xlsx') or file_ext.endswith('.xls')):
-            raise HTTPException(
-                status_code=400, 
-                detail="Unsupported file format. Please upload CSV (.csv) or Excel (.xlsx, .xls) files only."
-            )
-        
-        # Read file based on extension
-        file_content = await file.read()
-        
-        if file.filename.lower().endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(file_content))
-        elif file.filename.lower().endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(file_content))
+        file_ext = file_extension(file.filename)
+        if file_ext not in TRANSACTION_FILE_READERS:
+            raise HTTPException(status_code=400, detail=UNSUPPORTED_FORMAT_MESSAGE)
         
-        # Log file structure for debugging
-        logger.info(f"File columns: {df.columns.tolist()}")
-        logger.info(f"File shape: {df.shape}")
-        
-        # Create calculator
-        calculator = SettlementCalculator(settlement_type)
-        
-        # Load transactions using the calculator's method
-        load_result = calculator.load_transactions_from_dataframe(df)
+        # Parsing and loading block, so they run off the event loop
+        calculator, load_result = await asyncio.to_thread(
+            parse_and_load_upload, file.file, file_ext, settlement_type)
         
         if not load_result['success']:
             raise HTTPException(
@@ -162,7 +300,8 @@ async def upload_transactions(
             )
         
         # Store upload
-        upload_id = f"upload_{datetime.now().timestamp()}_{uuid.uuid4().hex[:8]}"
+        upload_id = new_calculation_id("upload")
+        timestamp = datetime.now().isoformat()
         store_data = {
             "type": "upload",
             "filename": file.filename,
@@ -171,7 +310,7 @@ async def upload_transactions(
             "errors": load_result.get('errors'),
             "error_count": load_result.get('error_count', 0),
             "calculator": calculator,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": timestamp
         }
         
         calculations_store[upload_id] = store_data
@@ -202,7 +341,7 @@ async def upload_transactions(
                 "success_rate": f"{(load_result['transactions_loaded'] / load_result['total_rows'] * 100):.1f}%" if load_result['total_rows'] > 0 else "0%"
             },
             "preview": transactions_preview,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": timestamp
         }
         
         # If calculate_now is True, calculate losses immediately
@@ -210,12 +349,12 @@ async def upload_transactions(
             response["calculation_performed"] = True
             
             try:
-                calc_start_time = datetime.now()
-                calculation_result = calculator.calculate_all_losses()
-                calc_processing_time = (datetime.now() - calc_start_time).total_seconds() * 1000
+                calc_start_time = time.perf_counter_ns()
+                calculation_result = await asyncio.to_thread(calculator.calculate_all_losses)
+                calc_processing_time = (time.perf_counter_ns() - calc_start_time) / 1e6
                 
                 if calculation_result['success']:
-                    calculation_id = f"calc_{datetime.now().timestamp()}_{uuid.uuid4().hex[:8]}"
+                    calculation_id = new_calculation_id("calc")
                     
                     # Get matches as DataFrame
                     matches_df = calculator.get_matches_dataframe()
@@ -226,7 +365,8 @@ async def upload_transactions(
                         "upload_id": upload_id,
                         "result": calculation_result,
                         "matches_df": matches_df,
-                        "timestamp": datetime.now().isoformat()
+                        "processing_time_ms": round(calc_processing_time, 2),
+                        "timestamp": timestamp
                     }
                     
                     store_data['calculation_id'] = calculation_id
@@ -249,13 +389,10 @@ async def upload_transactions(
                     
                     # Add detailed statistics if we have matches
                     if matches_df is not None and not matches_df.empty:
-                        # Calculate per share statistics
-                        if matches_df['quantity'].sum() > 0:
-                            avg_loss_per_share = matches_df['recognized_loss'].sum() / matches_df['quantity'].sum()
+                        # Per share statistics and rule distribution in one pass
+                        avg_loss_per_share, rule_counts = match_statistics(matches_df)
+                        if avg_loss_per_share is not None:
                             calculation_summary["average_loss_per_share"] = round(avg_loss_per_share, 4)
-                        
-                        # Rule distribution
-                        rule_counts = matches_df['rule_code'].value_counts().to_dict()
                         calculation_summary["rule_distribution"] = rule_counts
                     
                     response["calculation"] = calculation_summary
@@ -288,9 +425,18 @@ async def upload_transactions(
 async def calculate_batch_losses(
     upload_id: str = Body(..., description="Upload ID from previous upload"),
     match_method: str = Body("FIFO", description="Matching method (FIFO, LIFO, SPECIFIC_ID)"),
-    return_detailed: bool = Body(False, description="Return detailed match information")
+    return_detailed: bool = Body(False, description="Return detailed match information"),
+    stream: Optional[str] = Query(None, description="'ndjson' streams the response as newline-delimited JSON")
 ):
-    """Calculate losses for uploaded batch"""
+    """
+    Calculate losses for uploaded batch
+    
+    With stream=ndjson the response is streamed as newline-delimited JSON:
+    the summary object on the first line, then one line per detailed match.
+    """
+    if stream is not None and stream != 'ndjson':
+        raise HTTPException(status_code=400, detail="Unsupported stream format. Use 'ndjson'.")
+    
     try:
         logger.info(f"Batch calculation for upload_id: {upload_id}")
         
@@ -301,36 +447,47 @@ async def calculate_batch_losses(
         
         calculator = upload_data['calculator']
         
-        # Calculate all losses
-        start_time = datetime.now()
-        result = calculator.calculate_all_losses()
-        processing_time = (datetime.now() - start_time).total_seconds() * 1000
-        
-        if not result['success']:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Calculation failed: {result.get('error', 'Unknown error')}"
-            )
-        
-        # Get matches DataFrame
-        matches_df = calculator.get_matches_dataframe()
-        
-        # Generate calculation ID
-        calculation_id = f"batch_{datetime.now().timestamp()}_{uuid.uuid4().hex[:8]}"
-        
-        # Store results
-        store_data = {
-            "type": "batch",
-            "upload_id": upload_id,
-            "result": result,
-            "matches_df": matches_df,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        calculations_store[calculation_id] = store_data
-        
-        # Update upload data with calculation reference
-        upload_data['calculation_id'] = calculation_id
+        # An upload already calculated (calculate_now or an earlier batch
+        # call) is answered from that stored calculation: its transactions
+        # never change, and the calculator still holds the same matches
+        calculation_id = upload_data.get('calculation_id')
+        previous = calculations_store.get(calculation_id)
+        if previous is not None:
+            result = previous['result']
+            processing_time = previous['processing_time_ms']
+            matches_df = calculator.get_matches_dataframe()
+        else:
+            # Calculate all losses
+            start_time = time.perf_counter_ns()
+            result = calculator.calculate_all_losses()
+            processing_time = (time.perf_counter_ns() - start_time) / 1e6
+            
+            if not result['success']:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Calculation failed: {result.get('error', 'Unknown error')}"
+                )
+            
+            # Get matches DataFrame
+            matches_df = calculator.get_matches_dataframe()
+            
+            # Generate calculation ID
+            calculation_id = new_calculation_id("batch")
+            
+            # Store results
+            store_data = {
+                "type": "batch",
+                "upload_id": upload_id,
+                "result": result,
+                "matches_df": matches_df,
+                "processing_time_ms": round(processing_time, 2),
+                "timestamp": datetime.now().isoformat()
+            }
+            
+            calculations_store[calculation_id] = store_data
+            
+            # Update upload data with calculation reference
+            upload_data['calculation_id'] = calculation_id
         
         # Prepare response
         response = {
@@ -353,21 +510,16 @@ async def calculate_batch_losses(
             response["summary"]["fund_summary"] = result['fund_summary']
         
         # Add detailed match information if requested
-        if return_detailed and matches_df is not None and not matches_df.empty:
-            # Convert matches to list of dictionaries
-            matches_list = matches_df.to_dict('records')
-            response["detailed_matches"] = {
-                "count": len(matches_list),
-                "matches": matches_list[:100]  # Limit to 100 matches for response size
-            }
+        detailed = return_detailed and matches_df is not None and not matches_df.empty
+        if detailed:
+            response["detailed_matches"] = {"count": len(matches_df)}
+            if stream is None:
+                response["detailed_matches"]["matches"] = matches_df.to_dict('records')
             
-            # Add statistics
-            if matches_df['quantity'].sum() > 0:
-                avg_loss_per_share = matches_df['recognized_loss'].sum() / matches_df['quantity'].sum()
+            # Add statistics and rule distribution
+            avg_loss_per_share, rule_dist = match_statistics(matches_df)
+            if avg_loss_per_share is not None:
                 response["summary"]["average_loss_per_share"] = round(avg_loss_per_share, 4)
-            
-            # Add rule distribution
-            rule_dist = matches_df['rule_code'].value_counts().to_dict()
             response["summary"]["rule_distribution"] = rule_dist
         
         # Add download information
@@ -391,6 +543,11 @@ async def calculate_batch_losses(
             }
         ]
         
+        if stream is not None:
+            return StreamingResponse(
+                stream_batch_ndjson(response, matches_df if detailed else None),
+                media_type="application/x-ndjson"
+            )
         return response
         
     except Exception as e:
@@ -398,149 +555,169 @@ async def calculate_batch_losses(
         raise HTTPException(status_code=400, detail=str(e))
 
 
-# Helper function to validate and process upload data
-def process_transaction_file(file_content: bytes, filename: str) -> Dict[str, Any]:
-    """Process uploaded transaction file and return structured data"""
+@router.get("/download/results/{calculation_id}")
+async def download_results(
+    calculation_id: str,
+    format: str = Query("csv", description="Download format (csv, excel or json)")
+):
+    """Download the matches of a batch calculation"""
     try:
-        # Read file based on extension
-        if filename.lower().endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(file_content))
-        elif filename.lower().endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(file_content))
-        else:
-            return {
-                "success": False,
-                "error": "Unsupported file format. Use CSV or Excel."
-            }
-        
-        # Validate required data
-        if df.empty:
-            return {
-                "success": False,
-                "error": "File is empty"
-            }
-        
-        # Try to auto-detect column mappings
-        column_mapping = detect_column_mapping(df.columns)
-        
-        # Create structured data
-        transactions = []
-        errors = []
+        calculation = calculations_store.get(calculation_id)
+        if not calculation or calculation['type'] != 'batch':
+            raise HTTPException(status_code=404, detail="Calculation not found or invalid")
+        
+        format = format.lower()
+        if format not in ('csv', 'json', 'excel'):
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+        
+        # Reading the spilled frame back is blocking file I/O
+        matches_df = await asyncio.to_thread(calculations_store.load_matches, calculation)
+        filename = f"settlement_results_{calculation_id}"
+        
+        if format == 'csv':
+            return StreamingResponse(
+                stream_matches_csv(matches_df),
+                media_type="text/csv",
+                headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'}
+            )
         
-        for idx, row in df.iterrows():
-            try:
-                transaction = parse_transaction_row(row, column_mapping, idx)
-                if transaction:
-                    transactions.append(transaction)
-            except Exception as e:
-                errors.append(f"Row {idx}: {str(e)}")
+        if format == 'json':
+            return StreamingResponse(
+                stream_matches_json(matches_df),
+                media_type="application/json",
+                headers={"Content-Disposition": f'attachment; filename="{filename}.json"'}
+            )
         
-        return {
-            "success": True,
-            "transaction_count": len(transactions),
-            "total_rows": len(df),
-            "errors": errors if errors else None,
-            "error_count": len(errors),
-            "transactions": transactions,
-            "column_mapping": column_mapping
-        }
+        # Excel: openpyxl builds the whole workbook in memory, so only the
+        # write is moved off the event loop
+        path = await asyncio.to_thread(write_matches_excel, matches_df)
+        return FileResponse(
+            path,
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            filename=f"{filename}.xlsx",
+            background=BackgroundTask(os.unlink, path)
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        return {
-            "success": False,
-            "error": str(e)
-        }
+        logger.error(f"Download error: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-def detect_column_mapping(columns):
-    """Auto-detect column names based on common patterns"""
-    column_mapping = {}
-    
-    # Common column name variations
-    patterns = {
-        'date': ['trade_date', 'date', 'transaction_date', 'trade date', 'Trade Date'],
-        'quantity': ['quantity', 'shares', 'qty', 'Quantity', 'Shares'],
-        'price': ['price', 'price_per_share', 'price per share', 'Price', 'Price per Share'],
-        'type': ['type', 'transaction_type', 'transaction type', 'Type', 'Transaction Type'],
-        'fund': ['fund_name', 'fund', 'fund name', 'Fund Name', 'Fund'],
-        'entity': ['entity', 'client', 'customer', 'Entity', 'Client']
-    }
+def write_matches_excel(matches_df: pd.DataFrame) -> str:
+    """Write the matches DataFrame to a temporary .xlsx file and return its path"""
+    with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as tmp:
+        path = tmp.name
+    try:
+        matches_df.to_excel(path, sheet_name='Matches', index=False, engine='openpyxl')
+    except Exception:
+        os.unlink(path)
+        raise
+    return path
+
+
+def match_statistics(matches_df: pd.DataFrame):
+    """
+    Average loss per share (None without shares) and match count per rule
+    code (most common first), from a single grouped pass over the matches
+    """
+    stats = matches_df.groupby('rule_code', observed=True, sort=False).agg(
+        count=('rule_code', 'size'),
+        quantity=('quantity', 'sum'),
+        loss=('recognized_loss', 'sum')
+    )
+    total_quantity = stats['quantity'].sum()
+    avg_loss_per_share = stats['loss'].sum() / total_quantity if total_quantity > 0 else None
+    rule_counts = stats['count'].sort_values(ascending=False, kind='stable').to_dict()
+    return avg_loss_per_share, rule_counts
+
+
+def _csv_date_formats(matches_df: pd.DataFrame) -> Dict[str, str]:
+    """
+    strftime format per datetime column, as to_csv would pick for the
+    whole column (so every streamed chunk formats dates the same way)
+    """
+    formats = {}
+    for column in matches_df.select_dtypes(include='datetime').columns:
+        dates = matches_df[column].dropna()
+        if (dates.dt.microsecond != 0).any():
+            formats[column] = '%Y-%m-%d %H:%M:%S.%f'
+        elif (dates != dates.dt.normalize()).any():
+            formats[column] = '%Y-%m-%d %H:%M:%S'
+        else:
+            formats[column] = '%Y-%m-%d'
+    return formats
+
+
+def stream_matches_csv(matches_df: pd.DataFrame, chunksize: int = DOWNLOAD_CHUNK_ROWS):
+    """Yield the matches DataFrame as CSV text, chunksize rows at a time"""
+    date_formats = _csv_date_formats(matches_df)
+    buffer = io.StringIO()
     
-    for column in columns:
-        col_lower = str(column).lower().replace(' ', '_').replace('-', '_')
-        
-        for key, patterns_list in patterns.items():
-            for pattern in patterns_list:
-                pattern_lower = pattern.lower().replace(' ', '_').replace('-', '_')
-                if pattern_lower in col_lower or col_lower in pattern_lower:
-                    column_mapping[key] = column
-                    break
+    matches_df.iloc[:0].to_csv(buffer, index=False)
+    for start in range(0, len(matches_df), chunksize):
+        chunk = matches_df.iloc[start:start + chunksize]
+        chunk = chunk.assign(**{column: chunk[column].dt.strftime(date_format)
+                                for column, date_format in date_formats.items()})
+        chunk.to_csv(buffer, header=False, index=False)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
     
-    return column_mapping
+    # Header only, when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
 
 
-def parse_transaction_row(row, column_mapping, row_index):
-    """Parse a single transaction row"""
+def stream_matches_json(matches_df: pd.DataFrame, chunksize: int = DOWNLOAD_CHUNK_ROWS):
+    """Yield the matches DataFrame as a JSON array of records, chunk by chunk"""
+    yield '['
+    for start in range(0, len(matches_df), chunksize):
+        chunk = matches_df.iloc[start:start + chunksize]
+        records = chunk.to_json(orient='records', date_format='iso')[1:-1]
+        yield records if start == 0 else ',' + records
+    yield ']'
+
+
+def stream_batch_ndjson(response: Dict[str, Any], matches_df: Optional[pd.DataFrame],
+                        chunksize: int = DOWNLOAD_CHUNK_ROWS):
+    """Yield a batch response as NDJSON: the response, then each match record"""
+    yield json.dumps(response, default=str) + '\n'
+    if matches_df is not None:
+        for start in range(0, len(matches_df), chunksize):
+            chunk = matches_df.iloc[start:start + chunksize]
+            yield chunk.to_json(orient='records', date_format='iso', lines=True)
+
+
+def parse_and_load_upload(upload, file_ext: str, settlement_type: str):
+    """
+    Spool an uploaded file to disk, parse it and load it into a new
+    calculator (blocking; returns the calculator and its load result)
+    """
+    # Parse from a temporary file so the raw bytes are never held in
+    # memory next to the DataFrame
+    with tempfile.NamedTemporaryFile(suffix=file_ext, delete=False) as tmp:
+        shutil.copyfileobj(upload, tmp)
+    calculator = SettlementCalculator(settlement_type)
     try:
-        # Get values using column mapping
-        date_str = row.get(column_mapping.get('date', ''))
-        if pd.isna(date_str):
-            return None
-        
-        # Parse transaction type
-        type_str = str(row.get(column_mapping.get('type', ''), '')).lower()
-        if 'beginning' in type_str or 'opening' in type_str or 'holding' in type_str:
-            tx_type = 'BEGINNING_HOLDINGS'
-        elif 'purchase' in type_str or 'buy' in type_str:
-            tx_type = 'PURCHASE'
-        elif 'sale' in type_str or 'sell' in type_str:
-            tx_type = 'SALE'
-        else:
-            # Try to infer from quantity columns
-            purchases = float(row.get('Purchases', 0))
-            sales = float(row.get('Sales', 0))
-            holdings = float(row.get('Holdings', 0))
-            
-            if purchases > 0:
-                tx_type = 'PURCHASE'
-            elif sales > 0:
-                tx_type = 'SALE'
-            elif holdings > 0:
-                tx_type = 'BEGINNING_HOLDINGS'
-            else:
-                return None
-        
-        # Get quantity
-        quantity = 0.0
-        if tx_type == 'PURCHASE':
-            quantity = float(row.get('Purchases', 0))
-        elif tx_type == 'SALE':
-            quantity = float(row.get('Sales', 0))
-        elif tx_type == 'BEGINNING_HOLDINGS':
-            quantity = float(row.get('Holdings', 0))
-        
-        if quantity <= 0:
-            return None
-        
-        # Get price
-        price = float(row.get(column_mapping.get('price', ''), 0))
-        
-        # Get entity and fund
-        entity = str(row.get(column_mapping.get('entity', ''), f"Row_{row_index}"))
-        fund_name = str(row.get(column_mapping.get('fund', ''), entity))
-        
-        # Create transaction dictionary
-        transaction = {
-            'id': f"row_{row_index}",
-            'date': date_str,
-            'quantity': quantity,
-            'price': price,
-            'type': tx_type,
-            'entity': entity,
-            'fund_name': fund_name
-        }
-        
-        return transaction
-        
-    except Exception as e:
-        raise Exception(f"Failed to parse row: {str(e)}")
\ No newline at end of file
+        file_size = os.path.getsize(tmp.name)
+        if file_ext == '.csv' and file_size > UPLOAD_CHUNK_THRESHOLD_BYTES:
+            # Only one chunk of raw rows is held next to the parsed
+            # transactions (the pyarrow engine cannot read in chunks)
+            logger.info(f"Loading {file_size} byte file in chunks of {UPLOAD_CHUNK_ROWS} rows")
+            with pd.read_csv(tmp.name, chunksize=UPLOAD_CHUNK_ROWS) as chunks:
+                return calculator, calculator.load_transactions_from_chunks(chunks)
+        
+        df = TRANSACTION_FILE_READERS[file_ext](tmp.name)
+    finally:
+        os.unlink(tmp.name)
+    
+    # Log file structure for debugging
+    logger.info(f"File columns: {df.columns.tolist()}")
+    logger.info(f"File shape: {df.shape}")
+    
+    # Load transactions using the calculator's method
+    load_result = calculator.load_transactions_from_dataframe(df)
+    return calculator, load_result
+
@@ -0,0 +1,256 @@
+"""
+Compiled numeric kernels for recognized loss calculations
+
+Dates are passed as int64 microseconds since the Unix epoch, with NAT marking
+a missing date (shares still held). Every kernel returns the recognized loss
+per share together with an integer rule code.
+
+numba is optional: without it the kernels run as plain Python functions with
+identical results.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+try:
+    from numba import config, njit, prange
+    NUMBA_AVAILABLE = True
+
+    # TBB's worker threads can keep the interpreter from exiting once a
+    # parallel kernel has run off the main thread (e.g. in a server worker
+    # thread), so prefer OpenMP when it is available
+    config.THREADING_LAYER_PRIORITY = ['omp', 'tbb', 'workqueue']
+except ImportError:  # pragma: no cover - exercised only without numba
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+# Integer rule codes returned by the kernels
+RULE_OUTSIDE_PERIOD = 0
+RULE_A = 1
+RULE_B = 2
+RULE_C = 3
+RULE_D = 4
+RULE_POST_LOOKBACK = 5
+
+# Missing date sentinel, identical to numpy's NaT bit pattern
+NAT = np.iinfo(np.int64).min
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+
+
+def to_epoch_us(date: Optional[datetime]) -> int:
+    """Convert a naive datetime to int64 microseconds (NAT for None)"""
+    if date is None:
+        return NAT
+    return (date - _EPOCH) // _ONE_US
+
+
+@njit(cache=True)
+def _py_max(a, b):
+    """max() with Python's argument-order semantics (NaN-safe parity)"""
+    return b if b > a else a
+
+
+@njit(cache=True)
+def _py_min(a, b):
+    """min() with Python's argument-order semantics (NaN-safe parity)"""
+    return b if b < a else a
+
+
+@njit(cache=True)
+def twitter_loss_kernel(purchase_ts, purchase_price, sale_ts, sale_price,
+                        decline, avg_price_at_sale,
+                        class_start_ts, class_end_ts, first_corrective_ts,
+                        lookback_start_ts, lookback_end_ts, average_price):
+    """Twitter plan of allocation for one purchase/sale pair"""
+    if purchase_ts < class_start_ts or purchase_ts > class_end_ts:
+        return 0.0, RULE_OUTSIDE_PERIOD
+
+    # Rule (d): held shares (decline is measured against the lookback start)
+    if sale_ts == NAT:
+        held_loss = _py_max(0.0, purchase_price - average_price)
+        return _py_min(decline, held_loss), RULE_D
+
+    # Rule (a): sold before first corrective disclosure
+    if sale_ts < first_corrective_ts:
+        return 0.0, RULE_A
+
+    actual_loss = _py_max(0.0, purchase_price - sale_price)
+
+    # Rule (b): sold between first corrective disclosure and lookback start
+    if sale_ts < lookback_start_ts:
+        return _py_min(decline, actual_loss), RULE_B
+
+    # Rule (c): sold during lookback period
+    if sale_ts <= lookback_end_ts:
+        lookback_loss = _py_max(0.0, purchase_price - avg_price_at_sale)
+        return _py_min(_py_min(decline, actual_loss), lookback_loss), RULE_C
+
+    return _py_min(decline, actual_loss), RULE_POST_LOOKBACK
+
+
+@njit(cache=True)
+def kh_loss_kernel(purchase_ts, purchase_price, sale_ts, sale_price,
+                   purchase_inflation, sale_inflation, avg_price_at_sale,
+                   class_start_ts, class_end_ts, first_corrective_ts,
+                   lookback_start_ts, lookback_end_ts, average_price):
+    """Kraft Heinz plan of allocation for one purchase/sale pair"""
+    if purchase_ts < class_start_ts or purchase_ts > class_end_ts:
+        return 0.0, RULE_OUTSIDE_PERIOD
+
+    # Rule D: held shares
+    if sale_ts == NAT:
+        held_loss = _py_max(0.0, purchase_price - average_price)
+        return _py_min(purchase_inflation, held_loss), RULE_D
+
+    # Rule A: sold before first corrective disclosure
+    if sale_ts < first_corrective_ts:
+        return 0.0, RULE_A
+
+    inflation_decline = _py_max(0.0, purchase_inflation - sale_inflation)
+    actual_loss = _py_max(0.0, purchase_price - sale_price)
+
+    # Rule B: sold during class period
+    if sale_ts <= class_end_ts:
+        return _py_min(inflation_decline, actual_loss), RULE_B
+
+    # Rule C: sold during lookback period
+    if lookback_start_ts <= sale_ts <= lookback_end_ts:
+        lookback_loss = _py_max(0.0, purchase_price - avg_price_at_sale)
+        return _py_min(_py_min(inflation_decline, actual_loss), lookback_loss), RULE_C
+
+    return _py_min(inflation_decline, actual_loss), RULE_POST_LOOKBACK
+
+
+@njit(cache=True, parallel=True)
+def twitter_loss_batch(purchase_ts, purchase_price, sale_ts, sale_price,
+                       decline, avg_price_at_sale,
+                       class_start_ts, class_end_ts, first_corrective_ts,
+                       lookback_start_ts, lookback_end_ts, average_price):
+    """twitter_loss_kernel over parallel arrays of matches"""
+    n = purchase_ts.shape[0]
+    losses = np.empty(n, dtype=np.float64)
+    codes = np.empty(n, dtype=np.int8)
+    for i in prange(n):
+        losses[i], codes[i] = twitter_loss_kernel(
+            purchase_ts[i], purchase_price[i], sale_ts[i], sale_price[i],
+            decline[i], avg_price_at_sale[i],
+            class_start_ts, class_end_ts, first_corrective_ts,
+            lookback_start_ts, lookback_end_ts, average_price)
+    return losses, codes
+
+
+@njit(cache=True, parallel=True)
+def kh_loss_batch(purchase_ts, purchase_price, sale_ts, sale_price,
+                  purchase_inflation, sale_inflation, avg_price_at_sale,
+                  class_start_ts, class_end_ts, first_corrective_ts,
+                  lookback_start_ts, lookback_end_ts, average_price):
+    """kh_loss_kernel over parallel arrays of matches"""
+    n = purchase_ts.shape[0]
+    losses = np.empty(n, dtype=np.float64)
+    codes = np.empty(n, dtype=np.int8)
+    for i in prange(n):
+        losses[i], codes[i] = kh_loss_kernel(
+            purchase_ts[i], purchase_price[i], sale_ts[i], sale_price[i],
+            purchase_inflation[i], sale_inflation[i], avg_price_at_sale[i],
+            class_start_ts, class_end_ts, first_corrective_ts,
+            lookback_start_ts, lookback_end_ts, average_price)
+    return losses, codes
+
+
+@njit(cache=True, parallel=True)
+def held_loss_batch(purchase_price, loss_cap, average_price):
+    """
+    Rule D loss per share for held lots, each capped by its own loss_cap
+    (the decline amount or purchase inflation)
+
+    Returns (recognized loss, held loss) arrays.
+    """
+    n = purchase_price.shape[0]
+    losses = np.empty(n, dtype=np.float64)
+    held_loss = np.empty(n, dtype=np.float64)
+    for i in prange(n):
+        held_loss[i] = _py_max(0.0, purchase_price[i] - average_price)
+        losses[i] = _py_min(loss_cap[i], held_loss[i])
+    return losses, held_loss
+
+
+@njit(cache=True)
+def fifo_match_kernel(lot_remaining, sale_quantities, beginning_bounds,
+                      sale_bounds, n_beginning):
+    """
+    FIFO walk of sales (in date order) over inventory lots (in FIFO order)
+
+    The first n_beginning lots are beginning holdings and the rest are
+    purchases, each run sorted by date. For sale s, beginning_bounds[s] and
+    sale_bounds[s] end the beginning holdings and the purchases dated on or
+    before the sale, so lots dated after it are jumped over without a date
+    comparison per lot. Skipped lots stay available to later sales, and only
+    the depleted prefix of the inventory is passed over for good via the
+    head cursor. lot_remaining is consumed in place.
+
+    Returns (lot index, sale index, quantity) arrays per match and the
+    number of sales that reached a lot dated after the sale.
+    """
+    n_lots = len(lot_remaining)
+    n_sales = len(sale_quantities)
+
+    # Every match depletes a lot or completes a sale. Quantities stay
+    # float64 (they feed the money math); the match indexes fit in int32
+    capacity = n_lots + n_sales
+    out_lot_idx = np.empty(capacity, dtype=np.int32)
+    out_sale_idx = np.empty(capacity, dtype=np.int32)
+    out_qty = np.empty(capacity, dtype=np.float64)
+    n_matches = 0
+    n_short = 0
+    head = 0
+
+    for s in range(n_sales):
+        remaining_sale_qty = sale_quantities[s]
+        beginning_bound = beginning_bounds[s]
+        bound = sale_bounds[s]
+        reached_later_lot = False
+
+        while head < n_lots and lot_remaining[head] <= 0:
+            head += 1
+        i = head
+
+        while remaining_sale_qty > 0 and i < bound:
+            if beginning_bound <= i < n_beginning:
+                # Rest of the beginning holdings are dated after the sale
+                reached_later_lot = True
+                i = n_beginning
+                continue
+
+            remaining = lot_remaining[i]
+            if remaining <= 0:
+                i += 1
+                continue
+
+            qty = _py_min(remaining_sale_qty, remaining)
+            out_lot_idx[n_matches] = i
+            out_sale_idx[n_matches] = s
+            out_qty[n_matches] = qty
+            n_matches += 1
+
+            remaining -= qty
+            lot_remaining[i] = remaining
+            remaining_sale_qty -= qty
+            if remaining <= 0:
+                i += 1
+
+        if remaining_sale_qty > 0 and bound < n_lots:
+            reached_later_lot = True
+        if reached_later_lot:
+            n_short += 1
+
+    return out_lot_idx[:n_matches], out_sale_idx[:n_matches], out_qty[:n_matches], n_short
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -33,10 +33,11 @@ class SettlementConfig(BaseModel):
     decline_matrix: Optional[Dict[str, float]] = Field(None, description="Decline matrix for Twitter")
     time_groups: Optional[List[TimeGroup]] = Field(None, description="Time groups for Twitter")
 
-    @validator('class_start', 'class_end')
+    @field_validator('class_start', 'class_end')
+    @classmethod
     def validate_date_format(cls, v):
         try:
-            datetime.fromisoformat(v.replace('Z', '+00:00'))
+            datetime.fromisoformat(v)
         except ValueError:
             raise ValueError(f"Invalid date format: {v}. Use ISO format.")
         return v
@@ -52,10 +53,11 @@ class Transaction(BaseModel):
     security_id: Optional[str] = Field(None, description="Security identifier")
     comment: Optional[str] = Field(None, description="Comments")
 
-    @validator('date')
+    @field_validator('date')
+    @classmethod
     def validate_date(cls, v):
         try:
-            datetime.fromisoformat(v.replace('Z', '+00:00'))
+            datetime.fromisoformat(v)
         except ValueError:
             raise ValueError(f"Invalid date format: {v}")
         return v
@@ -1,12 +1,28 @@
+from typing import Any
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import uvicorn
 from api.endpoints import router as api_router
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response serialized with orjson (numpy values, NaN as null)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
 
 app = FastAPI(
     title="Settlement Loss Calculator API",
     description="API for calculating recognized losses in securities settlements",
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
 )
 
 app.add_middleware(
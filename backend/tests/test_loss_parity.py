@@ -0,0 +1,98 @@
+"""
+The recognized-loss rules are implemented three times: the loss kernels
+(compiled when numba is installed), the np.select fallback in
+_calculate_losses_batch and the scalar calculate_recognized_loss_per_share.
+These tests keep them in agreement on randomized matches.
+"""
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from api import calculator as calculator_module
+from api.calculator import RuleCode, SettlementCalculator
+
+logging.disable(logging.CRITICAL)
+
+N_MATCHES = 2000
+
+# Date windows that cover each settlement's class and lookback periods
+DATE_WINDOWS = {
+    'TWITTER': (datetime(2015, 1, 1), datetime(2016, 1, 1)),
+    'KRAFT_HEINZ': (datetime(2015, 10, 1), datetime(2020, 1, 1)),
+}
+
+
+def key_dates(calculator):
+    """Period edges where the rules switch, with the microseconds either side"""
+    edges = [calculator.class_start, calculator.class_end, calculator.lookback_start,
+             calculator.lookback_end, calculator.first_corrective_date_np.astype(datetime)]
+    step = timedelta(microseconds=1)
+    return [edge + offset for edge in edges for offset in (-step, timedelta(0), step)]
+
+
+def random_matches(calculator, seed):
+    """
+    Purchase/sale pairs with held shares (NaT), NaN prices, period edges
+    and 4/28/2015 intraday sales
+    """
+    rng = np.random.default_rng(seed)
+    start, end = DATE_WINDOWS[calculator.settlement_type.value]
+    span = int((end - start).total_seconds() // 60)
+
+    purchase_dates = [start + timedelta(minutes=int(m)) for m in rng.integers(0, span, N_MATCHES)]
+    sale_dates = [start + timedelta(minutes=int(m)) for m in rng.integers(0, span, N_MATCHES)]
+    for i in range(0, N_MATCHES, 5):
+        sale_dates[i] = None  # held shares
+    for i in range(1, N_MATCHES, 7):
+        # Around the 3:07 PM corrective disclosure, including midnight
+        sale_dates[i] = datetime(2015, 4, 28, int(rng.choice([0, 9, 14, 15, 16])),
+                                 int(rng.choice([0, 6, 7, 8, 59])))
+    edges = key_dates(calculator)
+    for i in range(4, N_MATCHES, 11):
+        sale_dates[i] = edges[int(rng.integers(len(edges)))]
+    for i in range(6, N_MATCHES, 13):
+        purchase_dates[i] = edges[int(rng.integers(len(edges)))]
+
+    purchase_prices = rng.uniform(10, 80, N_MATCHES).round(2)
+    sale_prices = rng.uniform(10, 80, N_MATCHES).round(2)
+    purchase_prices[3::41] = np.nan
+    sale_prices[2::17] = np.nan
+
+    return purchase_dates, purchase_prices, sale_dates, sale_prices
+
+
+def batch_losses(calculator, matches):
+    purchase_dates, purchase_prices, sale_dates, sale_prices = matches
+    result = calculator.calculate_recognized_loss_per_share(
+        np.array(purchase_dates, dtype='datetime64[us]'),
+        purchase_prices,
+        np.array([np.datetime64('NaT') if d is None else np.datetime64(d, 'us')
+                  for d in sale_dates]),
+        sale_prices,
+    )
+    return result['recognized_loss'], result['rule_code']
+
+
+@pytest.mark.parametrize('settlement_type', ['TWITTER', 'KRAFT_HEINZ'])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_kernel_fallback_and_scalar_agree(settlement_type, seed, monkeypatch):
+    calculator = SettlementCalculator(settlement_type)
+    matches = random_matches(calculator, seed)
+
+    # The kernels run as plain Python when numba is not installed
+    monkeypatch.setattr(calculator_module, 'NUMBA_AVAILABLE', True)
+    kernel_loss, kernel_code = batch_losses(calculator, matches)
+    monkeypatch.setattr(calculator_module, 'NUMBA_AVAILABLE', False)
+    fallback_loss, fallback_code = batch_losses(calculator, matches)
+
+    np.testing.assert_array_equal(kernel_code, fallback_code)
+    np.testing.assert_array_equal(kernel_loss, fallback_loss)
+
+    for i, (purchase_date, purchase_price, sale_date, sale_price) in enumerate(zip(*matches)):
+        result = calculator.calculate_recognized_loss_per_share(
+            purchase_date, float(purchase_price), sale_date,
+            None if sale_date is None else float(sale_price))
+        assert result['rule_code'] == RuleCode(int(kernel_code[i])).name, i
+        assert result['recognized_loss'] == pytest.approx(round(kernel_loss[i], 4), nan_ok=True), i